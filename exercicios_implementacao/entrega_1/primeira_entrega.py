@@ -16,6 +16,7 @@ DICA: O programa avalia somente o que está dentro das tags <>.
 """
 
 from sys import argv
+from collections import OrderedDict
 
 
 class FiniteAutomaton:
@@ -44,7 +45,120 @@ class FiniteAutomaton:
 
 class DeterministicFiniteAutomaton(FiniteAutomaton):
 
-    def minimize(self):
+    def moore_partition(self, states, final_states, alphabet, transitions):
+        """
+        Refinamento de Moore: a cada rodada, separa os estados de cada bloco pelo bloco do sucessor
+        em cada símbolo (-1 para transição ausente), até o número de blocos parar de crescer.
+        Mais lento que Hopcroft, mas dá a mesma partição; serve para conferir resultados.
+        """
+        partition = [group for group in (set(final_states), set(states) - set(final_states)) if group]
+
+        while True:
+            block_of = {}
+            for b, group in enumerate(partition):
+                for state in group:
+                    block_of[state] = b
+
+            new_partition = []
+            for group in partition:
+                partitions = {}
+                for state in group:
+                    key = tuple(block_of.get(transitions.get((state, symbol), None), -1) for symbol in alphabet)
+                    if key not in partitions:
+                        partitions[key] = set()
+                    partitions[key].add(state)
+                new_partition.extend(partitions.values())
+
+            # Blocos só se dividem e nunca ficam vazios, então mesmo tamanho significa partição estável
+            if len(new_partition) == len(partition):
+                break
+            partition = new_partition
+
+        return partition
+
+    @staticmethod
+    def hopcroft_partition(states, final_states, alphabet, transitions, labels=None):
+        """
+        Refinamento de Hopcroft: lista de trabalho de (bloco, símbolo) e índice de transições inversas.
+        Executa em O(n·|Σ|·log n). Transições ausentes levam a um sorvedouro implícito, que fica
+        sozinho em seu próprio bloco e nunca é devolvido na partição. Com labels (estado -> rótulo),
+        a partição inicial separa os estados por rótulo em vez de apenas finais e não finais.
+        """
+        states = list(states)
+        symbols = list(alphabet)
+        index = {state: i for i, state in enumerate(states)}
+        sink = len(states)
+
+        # inverse[c][q] = estados p tais que δ(p, c) = q
+        inverse = [[[] for _ in range(sink + 1)] for _ in symbols]
+        for c, symbol in enumerate(symbols):
+            inverse_c = inverse[c]
+            for p, state in enumerate(states):
+                next_state = transitions.get((state, symbol), None)
+                inverse_c[index.get(next_state, sink)].append(p)
+            inverse_c[sink].append(sink)
+
+        if labels is None:
+            initial_partition = [final_states, set(states) - set(final_states)]
+        else:
+            groups = {}
+            for state in states:
+                label = labels.get(state)
+                if label not in groups:
+                    groups[label] = set()
+                groups[label].add(state)
+            initial_partition = list(groups.values())
+        blocks = [{index[state] for state in group} for group in initial_partition if group]
+        blocks.append({sink})
+        block_of = [0] * (sink + 1)
+        for b, block in enumerate(blocks):
+            for p in block:
+                block_of[p] = b
+
+        # Basta usar como divisores todos os blocos iniciais menos o maior
+        largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+        worklist = [(b, c) for b in range(len(blocks)) if b != largest for c in range(len(symbols))]
+        pending = set(worklist)
+
+        while worklist:
+            splitter = worklist.pop()
+            pending.discard(splitter)
+            a, c = splitter
+            inverse_c = inverse[c]
+
+            # Agrupa a pré-imagem do divisor pelos blocos que ela toca
+            touched = {}
+            for q in list(blocks[a]):
+                for p in inverse_c[q]:
+                    b = block_of[p]
+                    if b not in touched:
+                        touched[b] = []
+                    touched[b].append(p)
+
+            for b, moved in touched.items():
+                block = blocks[b]
+                if len(moved) == len(block):
+                    continue
+
+                new_block = set(moved)
+                block -= new_block
+                new_b = len(blocks)
+                blocks.append(new_block)
+                for p in new_block:
+                    block_of[p] = new_b
+
+                smaller = new_b if len(new_block) <= len(block) else b
+                for d in range(len(symbols)):
+                    if (b, d) in pending:
+                        item = (new_b, d)
+                    else:
+                        item = (smaller, d)
+                    pending.add(item)
+                    worklist.append(item)
+
+        return [{states[p] for p in block} for block in blocks if sink not in block]
+
+    def minimize(self, method="hopcroft"):
         new_initial_state = self.initial_state
         new_final_states = set()
         new_alphabet = self.alphabet
@@ -83,33 +197,12 @@ class DeterministicFiniteAutomaton(FiniteAutomaton):
         new_final_states = {state for state in new_final_states if state in alive_states}
 
         # Remover estados equivalentes
-        partition = [new_final_states, new_states - new_final_states]
-
-        while True:
-            new_partition = []
-            for group in partition:
-                partitions = {}
-                for state in group:
-                    key = list({new_transitions.get((state, symbol), None) for symbol in new_alphabet})
-
-                    for l, k in enumerate(key):
-                        for j, p in enumerate(partition):
-                            if k in p:
-                                key[l] = j
-
-                    key = tuple(key)
-
-                    if key not in partitions:
-                        partitions[key] = set()
-                    partitions[key].add(state)
-
-                new_partition.extend(partitions.values())
-
-            if len(new_partition) == len(partition):
-                break
-
-            partition = new_partition
-        
+        if method == "hopcroft":
+            partition = self.hopcroft_partition(new_states, new_final_states, new_alphabet, new_transitions)
+        elif method == "moore":
+            partition = self.moore_partition(new_states, new_final_states, new_alphabet, new_transitions)
+        else:
+            raise ValueError(f"Método de minimização desconhecido: {method}")
 
         new_partition = [group for group in partition if group]
         
@@ -155,13 +248,409 @@ class DeterministicFiniteAutomaton(FiniteAutomaton):
 
         return DeterministicFiniteAutomaton(frozenset(new_states), new_initial_state, frozenset(new_final_states), new_alphabet, new_transitions)
 
+    def incremental_minimizer(self):
+        """Minimizador que mantém a partição e a atualiza a cada edição do AFD (ver IncrementalMinimizer)."""
+        return IncrementalMinimizer(self)
+
+
+class IncrementalMinimizer:
+    """
+    Mantém a partição de estados equivalentes de um AFD e a atualiza quando o AFD é editado
+    (transições adicionadas/removidas, estados que passam a ser ou deixam de ser finais), sem
+    minimizar tudo de novo. Só os estados que alcançam algum estado editado (R) podem mudar de
+    linguagem; os demais formam um sub-autômato fechado cujos blocos continuam exatos. A cada
+    edição:
+      - os estados de R saem de seus blocos e têm a vivacidade (alcançar um final) recalculada;
+      - Hopcroft refina só os estados vivos de R, com cada bloco de fora como um nó fixo;
+      - cada classe obtida é procurada por assinatura (final, blocos destino) no índice dos blocos
+        existentes, e reaproveita o bloco equivalente se houver (re-junção).
+    O custo fica proporcional a |R|. Se R passa de metade dos estados, ou sobra um ciclo de classes
+    novas que a assinatura não resolve, a partição é recalculada inteira (rebuild).
+    """
+    DEAD = -1
+    SELF = -2  # marca, na assinatura, a transição do bloco para ele mesmo
+
+    def __init__(self, automaton):
+        self.states = list(automaton.states)
+        self.index = {state: i for i, state in enumerate(self.states)}
+        self.symbols = sorted(automaton.alphabet - {"&"})
+        self.symbol_index = {symbol: c for c, symbol in enumerate(self.symbols)}
+        self.initial_state = self.index[automaton.initial_state]
+
+        n = len(self.states)
+        self.delta = [[self.DEAD] * n for _ in self.symbols]     # delta[c][p] = δ(p, c)
+        self.inverse = [[set() for _ in range(n)] for _ in self.symbols]
+        for (state, symbol), next_state in automaton.transitions.items():
+            if symbol in self.symbol_index:
+                self.set_transition(self.index[state], self.symbol_index[symbol], self.index[next_state])
+        self.final = bytearray(n)
+        for state in automaton.final_states:
+            self.final[self.index[state]] = 1
+        self.rebuild()
+
+    def set_transition(self, p, c, q):
+        old = self.delta[c][p]
+        if old != self.DEAD:
+            self.inverse[c][old].discard(p)
+        self.delta[c][p] = q
+        if q != self.DEAD:
+            self.inverse[c][q].add(p)
+
+    def add_state(self, state):
+        self.index[state] = len(self.states)
+        self.states.append(state)
+        for c in range(len(self.symbols)):
+            self.delta[c].append(self.DEAD)
+            self.inverse[c].append(set())
+        self.final.append(0)
+        self.alive.append(0)
+        self.block_of.append(self.DEAD)
+        return self.index[state]
+
+    def signature(self, p, own_block=None):
+        """(final, blocos destino) do estado p; None se algum destino ainda não tem bloco."""
+        targets = []
+        for c in range(len(self.symbols)):
+            q = self.delta[c][p]
+            if q == self.DEAD or not self.alive[q]:
+                targets.append(self.DEAD)
+            elif own_block is not None and q in own_block:
+                targets.append(self.SELF)
+            elif self.block_of[q] == self.DEAD:
+                return None
+            else:
+                targets.append(self.block_of[q])
+        return (self.final[p], tuple(targets))
+
+    def find_block(self, signature):
+        """Bloco existente com a assinatura. Um bloco b com laço guarda SELF onde aponta para si,
+        então também se tenta trocar cada destino b por SELF (vale só se o bloco achado for o b)."""
+        b = self.block_with_signature.get(signature)
+        if b is not None:
+            return b
+        final, targets = signature
+        for target in set(targets) - {self.DEAD, self.SELF}:
+            variant = (final, tuple(self.SELF if t == target else t for t in targets))
+            if self.block_with_signature.get(variant) == target:
+                return target
+        return None
+
+    def new_block(self, members, signature):
+        b = self.next_block
+        self.next_block += 1
+        self.blocks[b] = set(members)
+        self.block_signature[b] = signature
+        self.block_with_signature[signature] = b
+        for p in members:
+            self.block_of[p] = b
+        return b
+
+    def rebuild(self):
+        """Recalcula do zero a vivacidade e a partição (Hopcroft sobre os estados vivos)."""
+        n = len(self.states)
+        self.alive = bytearray(n)
+        queue = [p for p in range(n) if self.final[p]]
+        for p in queue:
+            self.alive[p] = 1
+        while queue:
+            q = queue.pop()
+            for inverse_c in self.inverse:
+                for p in inverse_c[q]:
+                    if not self.alive[p]:
+                        self.alive[p] = 1
+                        queue.append(p)
+
+        alive_states = [p for p in range(n) if self.alive[p]]
+        transitions = {}
+        for c in range(len(self.symbols)):
+            delta_c = self.delta[c]
+            for p in alive_states:
+                q = delta_c[p]
+                if q != self.DEAD and self.alive[q]:
+                    transitions[(p, c)] = q
+        finals = {p for p in alive_states if self.final[p]}
+        partition = DeterministicFiniteAutomaton.hopcroft_partition(alive_states, finals, range(len(self.symbols)), transitions)
+
+        self.block_of = [self.DEAD] * n
+        self.blocks = {}
+        self.block_signature = {}
+        self.block_with_signature = {}
+        self.next_block = 0
+        for b, group in enumerate(partition):
+            for p in group:
+                self.block_of[p] = b
+        self.next_block = len(partition)
+        for b, group in enumerate(partition):
+            self.blocks[b] = group
+            signature = self.signature(next(iter(group)), group)
+            self.block_signature[b] = signature
+            self.block_with_signature[signature] = b
+
+    def apply(self, added=(), removed=(), finals_added=(), finals_removed=()):
+        """
+        Aplica uma edição e atualiza a partição. added e removed são triplas (origem, símbolo,
+        destino) — adicionar sobrescreve a transição existente e remover só apaga δ(origem, símbolo)
+        se ela leva de fato ao destino dado; finals_added e finals_removed são estados. Estados
+        novos são criados; símbolos novos forçam o rebuild. Devolve o número de estados reexaminados.
+        """
+        touched = set()
+        new_symbol = False
+        for state, symbol, next_state in removed:
+            p, c, q = self.index.get(state), self.symbol_index.get(symbol), self.index.get(next_state)
+            if p is not None and c is not None and q is not None and self.delta[c][p] == q:
+                self.set_transition(p, c, self.DEAD)
+                touched.add(p)
+        for state, symbol, next_state in added:
+            p = self.index[state] if state in self.index else self.add_state(state)
+            q = self.index[next_state] if next_state in self.index else self.add_state(next_state)
+            if symbol not in self.symbol_index:
+                self.symbol_index[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+                self.delta.append([self.DEAD] * len(self.states))
+                self.inverse.append([set() for _ in self.states])
+                new_symbol = True
+            self.set_transition(p, self.symbol_index[symbol], q)
+            touched.add(p)
+        for state, value in [(state, 1) for state in finals_added] + [(state, 0) for state in finals_removed]:
+            p = self.index[state] if state in self.index else self.add_state(state)
+            if self.final[p] != value:
+                self.final[p] = value
+                touched.add(p)
+
+        # R: estados que alcançam algum estado editado
+        affected = set(touched)
+        queue = list(touched)
+        while queue:
+            q = queue.pop()
+            for inverse_c in self.inverse:
+                for p in inverse_c[q]:
+                    if p not in affected:
+                        affected.add(p)
+                        queue.append(p)
+
+        if new_symbol or 2 * len(affected) > len(self.states):
+            self.rebuild()
+            return len(self.states)
+
+        self.update(affected)
+        return len(affected)
+
+    def update(self, affected):
+        # Tira R dos blocos (blocos que esvaziam somem do índice de assinaturas)
+        for p in affected:
+            b = self.block_of[p]
+            if b != self.DEAD:
+                self.blocks[b].discard(p)
+                if not self.blocks[b]:
+                    del self.blocks[b]
+                    del self.block_with_signature[self.block_signature.pop(b)]
+                self.block_of[p] = self.DEAD
+
+        # Vivacidade em R: os de fora não mudam
+        for p in affected:
+            self.alive[p] = 0
+        queue = []
+        for p in affected:
+            if self.final[p] or any(self.delta[c][p] != self.DEAD and self.delta[c][p] not in affected and self.alive[self.delta[c][p]] for c in range(len(self.symbols))):
+                self.alive[p] = 1
+                queue.append(p)
+        while queue:
+            q = queue.pop()
+            for inverse_c in self.inverse:
+                for p in inverse_c[q]:
+                    if p in affected and not self.alive[p]:
+                        self.alive[p] = 1
+                        queue.append(p)
+
+        pending = [p for p in affected if self.alive[p]]
+        while pending:
+            # Hopcroft só em R: cada bloco de fora vira um nó fixo, com rótulo próprio
+            transitions = {}
+            labels = {}
+            for p in pending:
+                labels[p] = self.final[p]
+                for c in range(len(self.symbols)):
+                    q = self.delta[c][p]
+                    if q == self.DEAD or not self.alive[q]:
+                        continue
+                    if self.block_of[q] == self.DEAD:
+                        transitions[(p, c)] = q
+                    else:
+                        node = ("bloco", self.block_of[q])
+                        labels[node] = node
+                        transitions[(p, c)] = node
+            partition = DeterministicFiniteAutomaton.hopcroft_partition(
+                list(labels), set(), range(len(self.symbols)), transitions, labels)
+            classes = [group for group in partition if not isinstance(next(iter(group)), tuple)]
+
+            # Re-junção: resolve por assinatura as classes cujos destinos já têm bloco
+            merged = False
+            progress = True
+            while progress:
+                progress = False
+                unresolved = []
+                for group in classes:
+                    signature = self.signature(next(iter(group)), group)
+                    if signature is None:
+                        unresolved.append(group)
+                        continue
+                    progress = True
+                    b = self.find_block(signature)
+                    if b is None:
+                        self.new_block(group, signature)
+                    else:
+                        merged = True
+                        self.blocks[b] |= group
+                        for p in group:
+                            self.block_of[p] = b
+                classes = unresolved
+
+            pending = [p for group in classes for p in group]
+            if pending and not merged:
+                # Ciclo de classes novas sem bloco equivalente detectável por assinatura
+                self.rebuild()
+                return
+
+    def partition(self):
+        """Partição atual dos estados vivos, como lista de conjuntos de nomes."""
+        return [{self.states[p] for p in block} for block in self.blocks.values()]
+
+    def automaton(self):
+        """Monta o AFD mínimo (só blocos alcançáveis), com os estados nomeados como em minimize."""
+        if not self.alive[self.initial_state]:
+            return DeterministicFiniteAutomaton(frozenset(), frozenset(), frozenset(), set(self.symbols), {})
+
+        def name(b):
+            return frozenset(set.union(*[set(self.states[p]) for p in self.blocks[b]]))
+
+        start = self.block_of[self.initial_state]
+        order = [start]
+        seen = {start}
+        transitions = {}
+        for b in order:  # order cresce durante o laço
+            p = next(iter(self.blocks[b]))
+            for c, symbol in enumerate(self.symbols):
+                q = self.delta[c][p]
+                if q != self.DEAD and self.alive[q]:
+                    target = self.block_of[q]
+                    if target not in seen:
+                        seen.add(target)
+                        order.append(target)
+                    transitions[(name(b), symbol)] = name(target)
+        states = frozenset(name(b) for b in order)
+        final_states = frozenset(name(b) for b in order if self.final[next(iter(self.blocks[b]))])
+        return DeterministicFiniteAutomaton(states, name(start), final_states, set(self.symbols), transitions)
+
+class ObservedTransitions(dict):
+    """
+    Dicionário de transições que avisa o autômato dono a cada alteração no lugar, para que os
+    fechos-& memorizados nunca fiquem obsoletos. Os conjuntos de destino devem ser substituídos,
+    e não alterados no lugar, já que essas alterações não passam pelo dicionário.
+    """
+    def __init__(self, transitions=(), on_change=None):
+        super().__init__(transitions)
+        self.on_change = on_change
+
+    def changed(self):
+        on_change = getattr(self, "on_change", None)  # Ainda não existe enquanto pickle/copy refazem os itens
+        if on_change is not None:
+            on_change()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.changed()
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self.changed()
+        return result
+
+    def clear(self):
+        super().clear()
+        self.changed()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self.changed()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self.changed()
+        return result
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self.changed()
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.changed()
+
+
 class NonDeterministicFiniteAutomaton(FiniteAutomaton):
+    closure_cache_size = 4096  # Máximo de fechos-& memorizados por autômato (LRU)
+
+    @property
+    def transitions(self):
+        return self._transitions
+
+    @transitions.setter
+    def transitions(self, transitions):
+        self._transitions = ObservedTransitions(transitions, self.invalidate_closure_cache)
+        self.invalidate_closure_cache()
+
+    def invalidate_closure_cache(self):
+        """
+        Descarta os fechos-& memorizados. Reatribuir transitions ou alterá-lo no lugar já faz isso;
+        chame à mão só depois de alterar um conjunto de destinos no lugar.
+        """
+        cache = getattr(self, "closure_cache", None)
+        if cache is None:
+            self.closure_cache = OrderedDict()
+        else:
+            cache.clear()
+
+    def inherit_closure_cache(self, *automata):
+        """
+        Reaproveita fechos-& memorizados por outros autômatos que compartilham sub-autômatos com este.
+        Um fecho continua válido se nenhum estado dele tem transições & diferentes aqui e lá.
+        """
+        for automaton in automata:
+            cache = getattr(automaton, "closure_cache", None)
+            if not cache:
+                continue
+
+            epsilon_states = {state for (state, symbol) in self.transitions if symbol == "&"}
+            epsilon_states |= {state for (state, symbol) in automaton.transitions if symbol == "&"}
+            changed = {state for state in epsilon_states
+                       if self.transitions.get((state, "&")) != automaton.transitions.get((state, "&"))}
+
+            for key, closure in cache.items():
+                if key not in self.closure_cache and closure.isdisjoint(changed):
+                    self.closure_cache[key] = closure
+
+            while len(self.closure_cache) > self.closure_cache_size:
+                self.closure_cache.popitem(last=False)
+
     def epsilon_closure(self, state):
         if isinstance(state, frozenset):
             states = list(state)
         else:
             states = [state]
 
+        key = frozenset(states)
+        closure = self.closure_cache.get(key)
+        if closure is not None:
+            self.closure_cache.move_to_end(key)
+            return closure
+
+        visited = set(states)
         i = 0
         while i < len(states):
             state = states[i]
@@ -172,12 +661,25 @@ class NonDeterministicFiniteAutomaton(FiniteAutomaton):
                 new_states = self.transitions[(state, "&")]
 
             for new_state in new_states:
-                if new_state not in states:
+                if new_state not in visited:
+                    visited.add(new_state)
                     states.append(new_state)
 
-        return frozenset(states)
+        closure = frozenset(states)
+        self.closure_cache[key] = closure
+        if len(self.closure_cache) > self.closure_cache_size:
+            self.closure_cache.popitem(last=False)
+        return closure
+
+    def determinize(self, method="bitset"):
+        if method == "bitset":
+            new_alphabet = self.alphabet
+            if "&" in new_alphabet:
+                new_alphabet.remove("&")
+            return BitsetSubsetConstruction(self).determinize()
+        elif method != "reference":
+            raise ValueError(f"Método de determinização desconhecido: {method}")
 
-    def determinize(self):
         new_states = [self.epsilon_closure(self.initial_state)]
         new_initial_state = self.epsilon_closure(self.initial_state)
         new_final_states = set()
@@ -213,6 +715,258 @@ class NonDeterministicFiniteAutomaton(FiniteAutomaton):
 
         return DeterministicFiniteAutomaton(new_states, new_initial_state, frozenset(new_final_states), new_alphabet, new_transitions)
 
+    def lazy_matcher(self, cache_size=4096):
+        """Reconhecedor que determiniza sob demanda, sem construir o AFD inteiro."""
+        return LazyDFAMatcher(self, cache_size)
+
+
+class BitsetSubsetConstruction:
+    """
+    Construção de subconjuntos com conjuntos de estados do AFND representados como máscaras de bits.
+    O fecho-& de cada estado é calculado uma única vez (componentes fortemente conexas do grafo de
+    transições &, em ordem topológica reversa) e os estados do AFD descobertos são indexados num dicionário.
+    """
+    def __init__(self, automaton):
+        self.automaton = automaton
+        self.symbols = [symbol for symbol in automaton.alphabet if symbol != "&"]
+
+        # Numera todos os estados que aparecem no autômato
+        names = list(automaton.states)
+        seen = set(names)
+        for (state, _), next_states in automaton.transitions.items():
+            for name in [state, *next_states]:
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+        if automaton.initial_state not in seen:
+            names.append(automaton.initial_state)
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+
+        epsilon = [[] for _ in names]
+        moves = {symbol: [0] * len(names) for symbol in self.symbols}
+        for (state, symbol), next_states in automaton.transitions.items():
+            i = self.index[state]
+            if symbol == "&":
+                epsilon[i].extend(self.index[name] for name in next_states)
+            elif symbol in moves:
+                for name in next_states:
+                    moves[symbol][i] |= 1 << self.index[name]
+
+        # Fechos-& já memorizados pelo autômato entram prontos e seus estados não são percorridos
+        known = self.cached_closures()
+        self.closures = self.compute_closures(epsilon, known)
+        self.share_closures(known)
+        # Movimento por símbolo já seguido do fecho-&, por estado
+        self.moves = {symbol: [self.closure(mask) for mask in masks] for symbol, masks in moves.items()}
+        self.final_mask = 0
+        for name in automaton.final_states:
+            if name in self.index:
+                self.final_mask |= 1 << self.index[name]
+
+    def cached_closures(self):
+        """Máscaras dos fechos-& de estados isolados que já estão no cache LRU do autômato (índice -> máscara)."""
+        known = {}
+        cache = getattr(self.automaton, "closure_cache", None)
+        if not cache:
+            return known
+        for i, name in enumerate(self.names):
+            closure = cache.get(frozenset([name]))
+            if closure is not None and all(state in self.index for state in closure):
+                mask = 0
+                for state in closure:
+                    mask |= 1 << self.index[state]
+                known[i] = mask
+        return known
+
+    def share_closures(self, known):
+        """Devolve ao cache LRU do autômato os fechos calculados aqui, até o limite do cache, sem despejar nada."""
+        cache = getattr(self.automaton, "closure_cache", None)
+        if cache is None:
+            return
+        limit = self.automaton.closure_cache_size
+        for i, name in enumerate(self.names):
+            if len(cache) >= limit:
+                break
+            if i not in known:
+                cache[frozenset([name])] = self.to_states(self.closures[i])
+
+    @staticmethod
+    def compute_closures(epsilon, known=None):
+        """
+        Fecho-& de cada estado via Tarjan iterativo: cada componente herda o fecho das já emitidas.
+        Os estados em known (índice -> máscara) já têm o fecho pronto e contam como componentes emitidas.
+        """
+        n = len(epsilon)
+        closures = [0] * n
+        order = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack = []
+        counter = 0
+        for w, mask in (known or {}).items():
+            closures[w] = mask
+            order[w] = low[w] = counter
+            counter += 1
+
+        for root in range(n):
+            if order[root] != -1:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, iter(epsilon[root]))]
+
+            while work:
+                v, successors = work[-1]
+                for w in successors:
+                    if order[w] == -1:
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, iter(epsilon[w])))
+                        break
+                    elif on_stack[w]:
+                        low[v] = min(low[v], order[w])
+                else:
+                    work.pop()
+                    if work:
+                        u = work[-1][0]
+                        low[u] = min(low[u], low[v])
+                    if low[v] == order[v]:
+                        component = []
+                        while True:
+                            w = stack.pop()
+                            on_stack[w] = False
+                            component.append(w)
+                            if w == v:
+                                break
+                        # Membros da componente ainda têm fecho 0, então basta unir tudo
+                        mask = 0
+                        for w in component:
+                            mask |= 1 << w
+                            for x in epsilon[w]:
+                                mask |= closures[x]
+                        for w in component:
+                            closures[w] = mask
+        return closures
+
+    def closure(self, mask):
+        """Fecho-& de um conjunto de estados dado como máscara."""
+        result = 0
+        closures = self.closures
+        while mask:
+            low_bit = mask & -mask
+            result |= closures[low_bit.bit_length() - 1]
+            mask ^= low_bit
+        return result
+
+    def initial_mask(self):
+        return self.closures[self.index[self.automaton.initial_state]]
+
+    def step(self, mask, symbol):
+        """Estados alcançados (já com fecho-&) a partir da máscara lendo o símbolo; 0 se nenhum."""
+        moves = self.moves.get(symbol)
+        if moves is None:
+            return 0
+        result = 0
+        while mask:
+            low_bit = mask & -mask
+            result |= moves[low_bit.bit_length() - 1]
+            mask ^= low_bit
+        return result
+
+    def is_final(self, mask):
+        return bool(mask & self.final_mask)
+
+    def to_states(self, mask):
+        """Converte a máscara de volta para o frozenset de nomes de estados."""
+        states = []
+        while mask:
+            low_bit = mask & -mask
+            states.append(self.names[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return frozenset(states)
+
+    def determinize(self):
+        alphabet = self.automaton.alphabet
+        initial = self.initial_mask()
+        masks = [initial]
+        discovered = {initial: self.to_states(initial)}
+        new_transitions = {}
+
+        i = 0
+        while i < len(masks):
+            mask = masks[i]
+            i += 1
+            for symbol in self.symbols:
+                next_mask = self.step(mask, symbol)
+                if next_mask:
+                    if next_mask not in discovered:
+                        discovered[next_mask] = self.to_states(next_mask)
+                        masks.append(next_mask)
+                    new_transitions[(discovered[mask], symbol)] = discovered[next_mask]
+
+        new_states = [discovered[mask] for mask in masks]
+        new_final_states = {discovered[mask] for mask in masks if self.is_final(mask)}
+        return DeterministicFiniteAutomaton(new_states, discovered[initial], frozenset(new_final_states), alphabet, new_transitions)
+
+
+class LazyDFAMatcher:
+    """
+    AFD de subconjuntos construído sob demanda sobre um AFND: cada estado (máscara de bits) e cada
+    transição só são criados quando a entrada os alcança pela primeira vez, e ficam num cache limitado.
+    Se o cache precisar ser esvaziado muitas vezes sem reaproveitamento, passa a simular o AFND
+    diretamente, sem memorizar nada.
+    """
+    def __init__(self, automaton, cache_size=4096, max_flushes=8):
+        self.engine = BitsetSubsetConstruction(automaton)
+        self.cache_size = cache_size
+        self.max_flushes = max_flushes
+        self.cache = {}               # (máscara, símbolo) -> máscara
+        self.flushes = 0
+        self.steps_since_flush = 0
+        self.fallback = False
+
+    def next_mask(self, mask, symbol):
+        if self.fallback:
+            return self.engine.step(mask, symbol)
+
+        self.steps_since_flush += 1
+        key = (mask, symbol)
+        next_mask = self.cache.get(key)
+        if next_mask is None:
+            if len(self.cache) >= self.cache_size:
+                self.flush()
+            next_mask = self.engine.step(mask, symbol)
+            if not self.fallback:
+                self.cache[key] = next_mask
+        return next_mask
+
+    def flush(self):
+        """Esvazia o cache; se ele se esgota sem que cada entrada seja usada em média ao menos uma vez, desiste dele."""
+        if self.steps_since_flush < 2 * self.cache_size:
+            self.flushes += 1
+        self.steps_since_flush = 0
+        self.cache.clear()
+        if self.flushes > self.max_flushes:
+            self.fallback = True
+
+    def accepts(self, word):
+        mask = self.engine.initial_mask()
+        for symbol in word:
+            mask = self.next_mask(mask, symbol)
+            if not mask:
+                return False
+        return self.engine.is_final(mask)
+
+    def accepts_many(self, words):
+        """Gera, para cada palavra do iterável, se ela é aceita."""
+        for word in words:
+            yield self.accepts(word)
+
 
 def parse_automaton(automaton_str):
     parts = automaton_str.split(";")
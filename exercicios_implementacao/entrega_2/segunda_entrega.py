@@ -1,4 +1,18 @@
 from sys import argv
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from collections import OrderedDict, deque
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele, accepts_batch testa as palavras uma a uma
+    np = None
 
 
 class FiniteAutomaton:
@@ -19,7 +33,9 @@ class FiniteAutomaton:
         new_alphabet = self.alphabet.union(automate.alphabet)
         new_transitions = self.transitions | automate.transitions | {('q0', '&') : {self.initial_state, automate.initial_state}}
         
-        return NonDeterministicFiniteAutomaton(new_states, new_initial_state, new_final_states, new_alphabet, new_transitions)
+        result = NonDeterministicFiniteAutomaton(new_states, new_initial_state, new_final_states, new_alphabet, new_transitions)
+        result.inherit_closure_cache(self, automate)
+        return result
 
     def __str__(self) -> str:
         def format_state(state):
@@ -51,45 +67,133 @@ class FiniteAutomaton:
 
 class DeterministicFiniteAutomaton(FiniteAutomaton):
 
-    def minimize(self):
-        new_initial_state = self.initial_state
-        new_alphabet = self.alphabet
-        new_transitions = self.transitions.copy()
-
-        # Constrói a partição inicial: estados finais e não finais
-        partition = [self.final_states, set(self.states) - set(self.final_states)]
-
-        def find_group(state, partition):
-            """Encontra o grupo de uma partição ao qual o estado pertence."""
-            for group in partition:
-                if state in group:
-                    return group
-            return None
+    def moore_partition(self, states, final_states, alphabet, transitions):
+        """
+        Refinamento de Moore: a cada rodada, separa os estados de cada bloco pelo bloco do sucessor
+        em cada símbolo (-1 para transição ausente), até o número de blocos parar de crescer.
+        Mais lento que Hopcroft, mas dá a mesma partição; serve para conferir resultados.
+        """
+        partition = [group for group in (set(final_states), set(states) - set(final_states)) if group]
 
         while True:
+            block_of = {}
+            for b, group in enumerate(partition):
+                for state in group:
+                    block_of[state] = b
+
             new_partition = []
             for group in partition:
-                # Tenta dividir o grupo atual com base nas transições
                 partitions = {}
                 for state in group:
-                    key = []
-                    for symbol in new_alphabet:
-                        next_state = self.transition(state, symbol)
-                        if next_state:
-                            key.append(frozenset(find_group(next_state, partition)))  # converte para frozenset
-                        else:
-                            key.append(None)
-                    key = tuple(key)  # converte a lista para uma tupla
+                    key = tuple(block_of.get(transitions.get((state, symbol), None), -1) for symbol in alphabet)
                     if key not in partitions:
                         partitions[key] = set()
                     partitions[key].add(state)
-                
                 new_partition.extend(partitions.values())
-            
+
+            # Blocos só se dividem e nunca ficam vazios, então mesmo tamanho significa partição estável
             if len(new_partition) == len(partition):
-                break  # Nenhuma alteração na partição
+                break
             partition = new_partition
 
+        return partition
+
+    @staticmethod
+    def hopcroft_partition(states, final_states, alphabet, transitions, labels=None):
+        """
+        Refinamento de Hopcroft: lista de trabalho de (bloco, símbolo) e índice de transições inversas.
+        Executa em O(n·|Σ|·log n). Transições ausentes levam a um sorvedouro implícito, que fica
+        sozinho em seu próprio bloco e nunca é devolvido na partição. Com labels (estado -> rótulo),
+        a partição inicial separa os estados por rótulo em vez de apenas finais e não finais.
+        """
+        states = list(states)
+        symbols = list(alphabet)
+        index = {state: i for i, state in enumerate(states)}
+        sink = len(states)
+
+        # inverse[c][q] = estados p tais que δ(p, c) = q
+        inverse = [[[] for _ in range(sink + 1)] for _ in symbols]
+        for c, symbol in enumerate(symbols):
+            inverse_c = inverse[c]
+            for p, state in enumerate(states):
+                next_state = transitions.get((state, symbol), None)
+                inverse_c[index.get(next_state, sink)].append(p)
+            inverse_c[sink].append(sink)
+
+        if labels is None:
+            initial_partition = [final_states, set(states) - set(final_states)]
+        else:
+            # Estados só começam juntos se têm o mesmo rótulo (ex.: o token que reconhecem)
+            groups = {}
+            for state in states:
+                label = labels.get(state)
+                if label not in groups:
+                    groups[label] = set()
+                groups[label].add(state)
+            initial_partition = list(groups.values())
+        blocks = [{index[state] for state in group} for group in initial_partition if group]
+        blocks.append({sink})
+        block_of = [0] * (sink + 1)
+        for b, block in enumerate(blocks):
+            for p in block:
+                block_of[p] = b
+
+        # Basta usar como divisores todos os blocos iniciais menos o maior
+        largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+        worklist = [(b, c) for b in range(len(blocks)) if b != largest for c in range(len(symbols))]
+        pending = set(worklist)
+
+        while worklist:
+            splitter = worklist.pop()
+            pending.discard(splitter)
+            a, c = splitter
+            inverse_c = inverse[c]
+
+            # Agrupa a pré-imagem do divisor pelos blocos que ela toca
+            touched = {}
+            for q in list(blocks[a]):
+                for p in inverse_c[q]:
+                    b = block_of[p]
+                    if b not in touched:
+                        touched[b] = []
+                    touched[b].append(p)
+
+            for b, moved in touched.items():
+                block = blocks[b]
+                if len(moved) == len(block):
+                    continue
+
+                new_block = set(moved)
+                block -= new_block
+                new_b = len(blocks)
+                blocks.append(new_block)
+                for p in new_block:
+                    block_of[p] = new_b
+
+                smaller = new_b if len(new_block) <= len(block) else b
+                for d in range(len(symbols)):
+                    if (b, d) in pending:
+                        item = (new_b, d)
+                    else:
+                        item = (smaller, d)
+                    pending.add(item)
+                    worklist.append(item)
+
+        return [{states[p] for p in block} for block in blocks if sink not in block]
+
+    def minimize(self, method="hopcroft"):
+        new_initial_state = self.initial_state
+        new_alphabet = self.alphabet
+        new_transitions = self.transitions.copy()
+
+        # Constrói a partição de estados equivalentes
+        if method == "hopcroft":
+            partition = self.hopcroft_partition(self.states, self.final_states, new_alphabet, self.transitions)
+        elif method == "moore":
+            partition = self.moore_partition(self.states, self.final_states, new_alphabet, self.transitions)
+        else:
+            raise ValueError(f"Método de minimização desconhecido: {method}")
+
         # Mapeia os novos estados
         state_for_group = {}
         for group in partition:
@@ -108,15 +212,247 @@ class DeterministicFiniteAutomaton(FiniteAutomaton):
 
         return DeterministicFiniteAutomaton(new_states, new_initial_state, new_final_states, new_alphabet, new_transitions)
 
+    def canonical_order(self):
+        """Numera os estados alcançáveis em largura a partir do inicial, seguindo o alfabeto em ordem."""
+        symbols = sorted(set(self.alphabet) - {'&'})
+        number = {self.initial_state: 0}
+        order = [self.initial_state]
+        for state in order:  # order cresce durante o laço (fila da busca)
+            for symbol in symbols:
+                target = self.transitions.get((state, symbol))
+                if target is not None and target not in number:
+                    number[target] = len(order)
+                    order.append(target)
+        return symbols, order, number
+
+    def canonical(self):
+        """AFD equivalente só com os estados alcançáveis, renomeados "0", "1", ... pela ordem canônica."""
+        symbols, order, number = self.canonical_order()
+        transitions = {}
+        for state in order:
+            for symbol in symbols:
+                target = self.transitions.get((state, symbol))
+                if target is not None:
+                    transitions[(str(number[state]), symbol)] = str(number[target])
+        final_states = {str(number[state]) for state in order if state in self.final_states}
+        return DeterministicFiniteAutomaton({str(i) for i in range(len(order))}, "0", final_states, set(symbols), transitions)
+
+    def canonical_key(self):
+        """
+        Serialização canônica, feita numa única passada da busca em largura sobre os números dos
+        estados (sem formatar nomes): AFDs iguais a menos dos nomes e de estados inalcançáveis
+        geram a mesma string, que serve de chave de cache ou deduplicação. Para AFDs mínimos,
+        chaves iguais significam linguagens iguais.
+        """
+        symbols = sorted(set(self.alphabet) - {'&'})
+        transitions = self.transitions
+        final_states = self.final_states
+        number = {self.initial_state: 0}
+        order = [self.initial_state]
+        rows = []
+        finals = []
+        for index, state in enumerate(order):
+            if state in final_states:
+                finals.append(str(index))
+            row = []
+            for symbol in symbols:
+                target = transitions.get((state, symbol))
+                if target is None:
+                    row.append("-")
+                    continue
+                target_number = number.get(target)
+                if target_number is None:
+                    target_number = number[target] = len(order)
+                    order.append(target)
+                row.append(str(target_number))
+            rows.append(",".join(row))
+        return f"{len(order)};{repr(symbols)};{','.join(finals)};{';'.join(rows)}"
+
+    PRODUCT_OPERATIONS = {
+        "union": lambda a, b: a or b,
+        "intersection": lambda a, b: a and b,
+        "difference": lambda a, b: a and not b,
+        "symmetric_difference": lambda a, b: a != b,
+    }
+
+    def product(self, other, operation, minimize=True):
+        """
+        Construção do produto com outro AFD: explora em largura só os pares (p, q) alcançáveis a
+        partir dos estados iniciais; None faz o papel do estado morto de um AFD parcial. Pares que
+        não podem mais ser aceitos pela operação não são explorados. Os estados do produto são
+        numerados na ordem da busca ("0", "1", ...), então os nomes não colidem e não crescem
+        quando os produtos são encadeados.
+        """
+        accept = self.PRODUCT_OPERATIONS.get(operation)
+        if accept is None:
+            raise ValueError(f"Operação de produto desconhecida: {operation}")
+
+        # Um lado morto só pode rejeitar dali em diante
+        def outcomes(state):
+            return (False,) if state is None else (True, False)
+
+        def alive(p, q):
+            return any(accept(a, b) for a in outcomes(p) for b in outcomes(q))
+
+        symbols = sorted((set(self.alphabet) | set(other.alphabet)) - {'&'})
+        start = (self.initial_state, other.initial_state)
+        number = {start: 0}
+        queue = deque([start])
+        transitions = {}
+        final_states = set()
+        while queue:
+            pair = queue.popleft()
+            p, q = pair
+            name = str(number[pair])
+            if accept(p in self.final_states, q in other.final_states):
+                final_states.add(name)
+            for symbol in symbols:
+                next_p = self.transitions.get((p, symbol)) if p is not None else None
+                next_q = other.transitions.get((q, symbol)) if q is not None else None
+                target = (next_p, next_q)
+                if not alive(next_p, next_q):
+                    continue
+                if target not in number:
+                    number[target] = len(number)
+                    queue.append(target)
+                transitions[(name, symbol)] = str(number[target])
+
+        states = {str(i) for i in range(len(number))}
+        result = DeterministicFiniteAutomaton(states, "0", final_states, set(symbols), transitions)
+        return result.minimize(method="hopcroft") if minimize else result
+
+    def union(self, other, minimize=True):
+        return self.product(other, "union", minimize)
+
+    def intersection(self, other, minimize=True):
+        return self.product(other, "intersection", minimize)
+
+    def difference(self, other, minimize=True):
+        return self.product(other, "difference", minimize)
+
+    def symmetric_difference(self, other, minimize=True):
+        return self.product(other, "symmetric_difference", minimize)
+
+    def to_compact(self):
+        """Converte o AFD para a representação compacta indexada por inteiros."""
+        return CompactDFA.from_automaton(self)
+
+    def stream_matcher(self, chunk_size=1 << 16):
+        """Reconhecedor que percorre arquivos e buffers em blocos, com memória constante."""
+        return DFAStreamMatcher(self, chunk_size)
+
+
+
+class ObservedTransitions(dict):
+    """
+    Dicionário de transições que avisa o autômato dono a cada alteração no lugar, para que os
+    fechos-& memorizados nunca fiquem obsoletos. Os conjuntos de destino devem ser substituídos,
+    e não alterados no lugar, já que essas alterações não passam pelo dicionário.
+    """
+    def __init__(self, transitions=(), on_change=None):
+        super().__init__(transitions)
+        self.on_change = on_change
+
+    def changed(self):
+        on_change = getattr(self, "on_change", None)  # Ainda não existe enquanto pickle/copy refazem os itens
+        if on_change is not None:
+            on_change()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.changed()
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self.changed()
+        return result
+
+    def clear(self):
+        super().clear()
+        self.changed()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self.changed()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self.changed()
+        return result
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self.changed()
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.changed()
 
 
 class NonDeterministicFiniteAutomaton(FiniteAutomaton):
+    closure_cache_size = 4096  # Máximo de fechos-& memorizados por autômato (LRU)
+
+    @property
+    def transitions(self):
+        return self._transitions
+
+    @transitions.setter
+    def transitions(self, transitions):
+        self._transitions = ObservedTransitions(transitions, self.invalidate_closure_cache)
+        self.invalidate_closure_cache()
+
+    def invalidate_closure_cache(self):
+        """
+        Descarta os fechos-& memorizados. Reatribuir transitions ou alterá-lo no lugar já faz isso;
+        chame à mão só depois de alterar um conjunto de destinos no lugar.
+        """
+        cache = getattr(self, "closure_cache", None)
+        if cache is None:
+            self.closure_cache = OrderedDict()
+        else:
+            cache.clear()
+
+    def inherit_closure_cache(self, *automata):
+        """
+        Reaproveita fechos-& memorizados por outros autômatos que compartilham sub-autômatos com este.
+        Um fecho continua válido se nenhum estado dele tem transições & diferentes aqui e lá.
+        """
+        for automaton in automata:
+            cache = getattr(automaton, "closure_cache", None)
+            if not cache:
+                continue
+
+            epsilon_states = {state for (state, symbol) in self.transitions if symbol == "&"}
+            epsilon_states |= {state for (state, symbol) in automaton.transitions if symbol == "&"}
+            changed = {state for state in epsilon_states
+                       if self.transitions.get((state, "&")) != automaton.transitions.get((state, "&"))}
+
+            for key, closure in cache.items():
+                if key not in self.closure_cache and closure.isdisjoint(changed):
+                    self.closure_cache[key] = closure
+
+            while len(self.closure_cache) > self.closure_cache_size:
+                self.closure_cache.popitem(last=False)
+
     def epsilon_closure(self, state):
         if isinstance(state, frozenset):
             states = list(state)
         else:
             states = [state]
 
+        key = frozenset(states)
+        closure = self.closure_cache.get(key)
+        if closure is not None:
+            self.closure_cache.move_to_end(key)
+            return closure
+
+        visited = set(states)
         i = 0
         while i < len(states):
             state = states[i]
@@ -127,12 +463,25 @@ class NonDeterministicFiniteAutomaton(FiniteAutomaton):
                 new_states = self.transitions[(state, "&")]
 
             for new_state in new_states:
-                if new_state not in states:
+                if new_state not in visited:
+                    visited.add(new_state)
                     states.append(new_state)
 
-        return frozenset(states)
+        closure = frozenset(states)
+        self.closure_cache[key] = closure
+        if len(self.closure_cache) > self.closure_cache_size:
+            self.closure_cache.popitem(last=False)
+        return closure
+
+    def determinize(self, method="bitset"):
+        if method == "bitset":
+            new_alphabet = self.alphabet
+            if "&" in new_alphabet:
+                new_alphabet.remove("&")
+            return BitsetSubsetConstruction(self).determinize()
+        elif method != "reference":
+            raise ValueError(f"Método de determinização desconhecido: {method}")
 
-    def determinize(self):
         new_states = [self.epsilon_closure(self.initial_state)]
         new_initial_state = self.epsilon_closure(self.initial_state)
         new_final_states = set()
@@ -170,8 +519,848 @@ class NonDeterministicFiniteAutomaton(FiniteAutomaton):
         return DeterministicFiniteAutomaton(new_states, new_initial_state, frozenset(new_final_states), new_alphabet, new_transitions)
 
 
+class BitsetSubsetConstruction:
+    """
+    Construção de subconjuntos com conjuntos de estados do AFND representados como máscaras de bits.
+    O fecho-& de cada estado é calculado uma única vez (componentes fortemente conexas do grafo de
+    transições &, em ordem topológica reversa) e os estados do AFD descobertos são indexados num dicionário.
+    """
+    def __init__(self, automaton):
+        self.automaton = automaton
+        self.symbols = [symbol for symbol in automaton.alphabet if symbol != "&"]
+
+        # Numera todos os estados que aparecem no autômato
+        names = list(automaton.states)
+        seen = set(names)
+        for (state, _), next_states in automaton.transitions.items():
+            for name in [state, *next_states]:
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+        if automaton.initial_state not in seen:
+            names.append(automaton.initial_state)
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+
+        epsilon = [[] for _ in names]
+        moves = {symbol: [0] * len(names) for symbol in self.symbols}
+        for (state, symbol), next_states in automaton.transitions.items():
+            i = self.index[state]
+            if symbol == "&":
+                epsilon[i].extend(self.index[name] for name in next_states)
+            elif symbol in moves:
+                for name in next_states:
+                    moves[symbol][i] |= 1 << self.index[name]
+
+        # Fechos-& já memorizados pelo autômato entram prontos e seus estados não são percorridos
+        known = self.cached_closures()
+        self.closures = self.compute_closures(epsilon, known)
+        self.share_closures(known)
+        # Movimento por símbolo já seguido do fecho-&, por estado
+        self.moves = {symbol: [self.closure(mask) for mask in masks] for symbol, masks in moves.items()}
+        self.final_mask = 0
+        for name in automaton.final_states:
+            if name in self.index:
+                self.final_mask |= 1 << self.index[name]
+
+    def cached_closures(self):
+        """Máscaras dos fechos-& de estados isolados que já estão no cache LRU do autômato (índice -> máscara)."""
+        known = {}
+        cache = getattr(self.automaton, "closure_cache", None)
+        if not cache:
+            return known
+        for i, name in enumerate(self.names):
+            closure = cache.get(frozenset([name]))
+            if closure is not None and all(state in self.index for state in closure):
+                mask = 0
+                for state in closure:
+                    mask |= 1 << self.index[state]
+                known[i] = mask
+        return known
+
+    def share_closures(self, known):
+        """Devolve ao cache LRU do autômato os fechos calculados aqui, até o limite do cache, sem despejar nada."""
+        cache = getattr(self.automaton, "closure_cache", None)
+        if cache is None:
+            return
+        limit = self.automaton.closure_cache_size
+        for i, name in enumerate(self.names):
+            if len(cache) >= limit:
+                break
+            if i not in known:
+                cache[frozenset([name])] = self.to_states(self.closures[i])
+
+    @staticmethod
+    def compute_closures(epsilon, known=None):
+        """
+        Fecho-& de cada estado via Tarjan iterativo: cada componente herda o fecho das já emitidas.
+        Os estados em known (índice -> máscara) já têm o fecho pronto e contam como componentes emitidas.
+        """
+        n = len(epsilon)
+        closures = [0] * n
+        order = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack = []
+        counter = 0
+        for w, mask in (known or {}).items():
+            closures[w] = mask
+            order[w] = low[w] = counter
+            counter += 1
+
+        for root in range(n):
+            if order[root] != -1:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, iter(epsilon[root]))]
+
+            while work:
+                v, successors = work[-1]
+                for w in successors:
+                    if order[w] == -1:
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, iter(epsilon[w])))
+                        break
+                    elif on_stack[w]:
+                        low[v] = min(low[v], order[w])
+                else:
+                    work.pop()
+                    if work:
+                        u = work[-1][0]
+                        low[u] = min(low[u], low[v])
+                    if low[v] == order[v]:
+                        component = []
+                        while True:
+                            w = stack.pop()
+                            on_stack[w] = False
+                            component.append(w)
+                            if w == v:
+                                break
+                        # Membros da componente ainda têm fecho 0, então basta unir tudo
+                        mask = 0
+                        for w in component:
+                            mask |= 1 << w
+                            for x in epsilon[w]:
+                                mask |= closures[x]
+                        for w in component:
+                            closures[w] = mask
+        return closures
+
+    def closure(self, mask):
+        """Fecho-& de um conjunto de estados dado como máscara."""
+        result = 0
+        closures = self.closures
+        while mask:
+            low_bit = mask & -mask
+            result |= closures[low_bit.bit_length() - 1]
+            mask ^= low_bit
+        return result
+
+    def initial_mask(self):
+        return self.closures[self.index[self.automaton.initial_state]]
+
+    def step(self, mask, symbol):
+        """Estados alcançados (já com fecho-&) a partir da máscara lendo o símbolo; 0 se nenhum."""
+        moves = self.moves.get(symbol)
+        if moves is None:
+            return 0
+        result = 0
+        while mask:
+            low_bit = mask & -mask
+            result |= moves[low_bit.bit_length() - 1]
+            mask ^= low_bit
+        return result
+
+    def is_final(self, mask):
+        return bool(mask & self.final_mask)
+
+    def to_states(self, mask):
+        """Converte a máscara de volta para o frozenset de nomes de estados."""
+        states = []
+        while mask:
+            low_bit = mask & -mask
+            states.append(self.names[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return frozenset(states)
+
+    def determinize(self):
+        alphabet = self.automaton.alphabet
+        initial = self.initial_mask()
+        masks = [initial]
+        discovered = {initial: self.to_states(initial)}
+        new_transitions = {}
+
+        i = 0
+        while i < len(masks):
+            mask = masks[i]
+            i += 1
+            for symbol in self.symbols:
+                next_mask = self.step(mask, symbol)
+                if next_mask:
+                    if next_mask not in discovered:
+                        discovered[next_mask] = self.to_states(next_mask)
+                        masks.append(next_mask)
+                    new_transitions[(discovered[mask], symbol)] = discovered[next_mask]
+
+        new_states = [discovered[mask] for mask in masks]
+        new_final_states = {discovered[mask] for mask in masks if self.is_final(mask)}
+        return DeterministicFiniteAutomaton(new_states, discovered[initial], frozenset(new_final_states), alphabet, new_transitions)
+
+
+class LanguageView:
+    """
+    Visão mínima de um autômato para percorrer a linguagem: estado inicial, passo e teste de
+    aceitação. AFD usa os próprios estados (None é o estado morto); AFND usa máscaras da construção
+    de subconjuntos, calculadas só quando visitadas; uma tupla (a, b) é a união das duas linguagens.
+    """
+    def __init__(self, automaton):
+        self.automaton = automaton
+        self.steps = {}  # (estado, símbolo) -> estado, memorizado
+        if isinstance(automaton, tuple):
+            self.parts = tuple(LanguageView(part) for part in automaton)
+            self.alphabet = set().union(*(part.alphabet for part in self.parts))
+            self.initial_state = tuple(part.initial_state for part in self.parts)
+        elif isinstance(automaton, NonDeterministicFiniteAutomaton):
+            self.subsets = BitsetSubsetConstruction(automaton)
+            self.alphabet = set(self.subsets.symbols)
+            self.initial_state = self.subsets.initial_mask()
+        else:
+            self.alphabet = set(automaton.alphabet) - {'&'}
+            self.initial_state = automaton.initial_state
+
+    def step(self, state, symbol):
+        key = (state, symbol)
+        if key in self.steps:
+            return self.steps[key]
+        if isinstance(self.automaton, tuple):
+            result = tuple(part.step(s, symbol) for part, s in zip(self.parts, state))
+        elif isinstance(self.automaton, NonDeterministicFiniteAutomaton):
+            result = self.subsets.step(state, symbol)
+        else:
+            result = self.automaton.transitions.get(key) if state is not None else None
+        self.steps[key] = result
+        return result
+
+    def is_final(self, state):
+        if isinstance(self.automaton, tuple):
+            return any(part.is_final(s) for part, s in zip(self.parts, state))
+        if isinstance(self.automaton, NonDeterministicFiniteAutomaton):
+            return self.subsets.is_final(state)
+        return state in self.automaton.final_states
+
+
+def equivalent(automaton1, automaton2):
+    """
+    Testa se os autômatos (AFD ou AFND) aceitam a mesma linguagem pelo algoritmo de Hopcroft-Karp:
+    une em union-find os pares de estados que devem ser equivalentes, explorando em largura a
+    partir dos iniciais. Devolve (True, None) ou (False, palavra), com a palavra aceita por só um deles.
+    """
+    views = (LanguageView(automaton1), LanguageView(automaton2))
+    symbols = sorted(views[0].alphabet | views[1].alphabet)
+    parent = {}
+
+    def find(node):
+        root = node
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while node != root:  # compressão de caminho
+            parent[node], node = root, parent[node]
+        return root
+
+    start = ((0, views[0].initial_state), (1, views[1].initial_state))
+    parent[find(start[0])] = find(start[1])
+    visited = [(start, None, None)]  # (par, índice do par anterior, símbolo lido)
+    queue = deque([0])
+    while queue:
+        index = queue.popleft()
+        (_, p), (_, q) = visited[index][0]
+        if views[0].is_final(p) != views[1].is_final(q):
+            word = []
+            while visited[index][1] is not None:
+                word.append(visited[index][2])
+                index = visited[index][1]
+            return False, ''.join(reversed(word))
+
+        for symbol in symbols:
+            pair = ((0, views[0].step(p, symbol)), (1, views[1].step(q, symbol)))
+            root1, root2 = find(pair[0]), find(pair[1])
+            if root1 != root2:
+                parent[root1] = root2
+                visited.append((pair, index, symbol))
+                queue.append(len(visited) - 1)
+    return True, None
+
+
+def includes(automaton1, automaton2):
+    """
+    Testa se L(automaton2) está contida em L(automaton1), comparando automaton1 com a união dos
+    dois (iguais exatamente quando há inclusão). Devolve (True, None) ou (False, palavra), com uma
+    palavra aceita por automaton2 e rejeitada por automaton1.
+    """
+    return equivalent(automaton1, (automaton1, automaton2))
+
+
+class CompactState:
+    """Registro de um estado da representação compacta: índice, nome original e se é final."""
+    __slots__ = ("index", "name", "is_final")
+
+    def __init__(self, index, name, is_final):
+        self.index = index
+        self.name = name
+        self.is_final = is_final
+
+    def __str__(self):
+        return format_set(self.name)
+
+
+class CompactDFA:
+    """
+    AFD com estados numerados 0..n-1 e símbolos internados em 0..k-1.
+    As transições ficam numa tabela plana array('i') de tamanho n·k, onde a linha
+    do estado q começa em q·k; DEAD marca transição ausente (estado morto).
+    """
+    DEAD = -1
+    __slots__ = ("states", "symbols", "symbol_index", "table", "initial_state", "final", "matrix")
+
+    def __init__(self, states, symbols, table, initial_state):
+        self.states = states                # lista de CompactState, indexada pelo número do estado
+        self.symbols = symbols              # lista de símbolos, indexada pelo número do símbolo
+        self.symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        self.table = table                  # array('i') com len(states) * len(symbols) posições
+        self.initial_state = initial_state
+        self.final = bytearray(state.is_final for state in states)
+        self.matrix = None                  # tabela NumPy total, montada no primeiro accepts_batch
+
+    @classmethod
+    def from_automaton(cls, automaton):
+        """Numera os estados (o inicial recebe 0) e interna os símbolos de um AFD."""
+        names = [automaton.initial_state]
+        names.extend(state for state in automaton.states if state != automaton.initial_state)
+        index = {name: i for i, name in enumerate(names)}
+        symbols = sorted(symbol for symbol in automaton.alphabet if symbol != "&")
+        width = len(symbols)
+
+        table = array("i", [cls.DEAD]) * (len(names) * width)
+        for c, symbol in enumerate(symbols):
+            for q, name in enumerate(names):
+                next_state = automaton.transition(name, symbol)
+                if next_state is not None:
+                    table[q * width + c] = index[next_state]
+
+        states = [CompactState(i, name, name in automaton.final_states) for i, name in enumerate(names)]
+        return cls(states, symbols, table, 0)
+
+    def to_automaton(self):
+        """Reconstrói o DeterministicFiniteAutomaton equivalente com os nomes originais dos estados."""
+        width = len(self.symbols)
+        transitions = {}
+        for state in self.states:
+            row = state.index * width
+            for c, symbol in enumerate(self.symbols):
+                target = self.table[row + c]
+                if target != self.DEAD:
+                    transitions[(state.name, symbol)] = self.states[target].name
+
+        return DeterministicFiniteAutomaton(
+            {state.name for state in self.states},
+            self.states[self.initial_state].name,
+            {state.name for state in self.states if state.is_final},
+            set(self.symbols),
+            transitions
+        )
+
+    def __len__(self):
+        return len(self.states)
+
+    def step(self, state, symbol):
+        """Transição a partir do número do estado; devolve DEAD se não houver."""
+        c = self.symbol_index.get(symbol)
+        if c is None or state == self.DEAD:
+            return self.DEAD
+        return self.table[state * len(self.symbols) + c]
+
+    def run(self, word, state=None):
+        """Consome a palavra e devolve o número do estado alcançado (ou DEAD)."""
+        table = self.table
+        width = len(self.symbols)
+        symbol_index = self.symbol_index
+        if state is None:
+            state = self.initial_state
+
+        for symbol in word:
+            c = symbol_index.get(symbol)
+            if c is None:
+                return self.DEAD
+            state = table[state * width + c]
+            if state == self.DEAD:
+                return self.DEAD
+        return state
+
+    def accepts(self, word):
+        state = self.run(word)
+        return state != self.DEAD and bool(self.final[state])
+
+    def numpy_matrix(self):
+        """
+        Tabela total de forma (n + 1, k + 2): a linha n é o estado morto, a coluna k leva
+        símbolos fora do alfabeto ao estado morto e a coluna k + 1 (preenchimento) não muda o estado.
+        """
+        if self.matrix is None:
+            n, k = len(self.states), len(self.symbols)
+            table = np.frombuffer(self.table, dtype=np.int32).reshape(n, k) if n and k else np.zeros((n, k), np.int32)
+            matrix = np.empty((n + 1, k + 2), dtype=np.int32)
+            matrix[:n, :k] = np.where(table == self.DEAD, n, table)
+            matrix[:, k] = n
+            matrix[:, k + 1] = np.arange(n + 1, dtype=np.int32)
+            matrix[n, :k] = n
+            self.matrix = matrix
+        return self.matrix
+
+    def pack_words(self, words):
+        """Empacota as palavras numa matriz (palavras × maior comprimento) de números de símbolo, com preenchimento."""
+        k = len(self.symbols)
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        codes = np.full((len(words), int(lengths.max(initial=0))), k + 1, dtype=np.int32)
+        if not lengths.sum():
+            return codes
+
+        if k and all(len(symbol) == 1 for symbol in self.symbols):
+            # Converte todos os caracteres de uma vez pelos seus códigos Unicode
+            points = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+            alphabet = np.array(sorted(ord(symbol) for symbol in self.symbols), dtype=np.uint32)
+            by_order = np.array([self.symbol_index[chr(c)] for c in alphabet], dtype=np.int32)
+            position = np.minimum(np.searchsorted(alphabet, points), k - 1)
+            flat = np.where(alphabet[position] == points, by_order[position], k)
+        else:
+            flat = np.fromiter((self.symbol_index.get(symbol, k) for word in words for symbol in word), dtype=np.int32)
+
+        rows = np.repeat(np.arange(len(words)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        columns = np.arange(len(flat)) - np.repeat(starts, lengths)
+        codes[rows, columns] = flat
+        return codes
+
+    def accepts_batch(self, words):
+        """
+        Testa várias palavras de uma vez, avançando todas juntas uma coluna da matriz por vez.
+        Devolve (máscara de aceitação, estado final de cada palavra), com DEAD para as que morreram.
+        Sem NumPy, devolve listas equivalentes calculadas palavra a palavra.
+        """
+        words = list(words)
+        if np is None:
+            finals = [self.run(word) for word in words]
+            return [state != self.DEAD and bool(self.final[state]) for state in finals], finals
+
+        matrix = self.numpy_matrix()
+        dead = len(self.states)
+        codes = self.pack_words(words)
+        current = np.full(len(words), self.initial_state if self.states else dead, dtype=np.int32)
+        for column in codes.T:
+            current = matrix[current, column]
+
+        final = np.append(np.frombuffer(bytes(self.final), dtype=np.uint8).astype(bool), False)
+        accepted = final[current]
+        return accepted, np.where(current == dead, self.DEAD, current)
+
+
+class SymbolCodeTable(dict):
+    """Dicionário caractere -> número do símbolo (unknown fora do alfabeto, unknown + 1 para o separador), preenchido sob demanda."""
+    def __init__(self, symbol_index, unknown, classes=None, separator=None):
+        super().__init__()
+        self.symbol_index = symbol_index
+        self.unknown = unknown
+        self.classes = classes
+        self.separator = separator
+
+    def __missing__(self, char):
+        if char == self.separator:
+            code = self.unknown + 1
+        else:
+            symbol = self.classes.classify(char) if self.classes is not None else char
+            code = self.symbol_index.get(symbol, self.unknown)
+        self[char] = code
+        return code
+
+
+class DFAStreamMatcher:
+    """
+    Executa um AFD sobre arquivos, bytes ou mmap lidos em blocos, sem copiar a entrada inteira.
+    O estado atravessa as fronteiras entre blocos; os offsets contam bytes (entrada binária,
+    lida como latin-1) ou caracteres (entrada de texto). Se o AFD usa classes de símbolos
+    (SymbolClasses), cada caractere é classificado antes de consultar a tabela.
+    """
+    def __init__(self, automaton, chunk_size=1 << 16, classes=None):
+        if not isinstance(automaton, CompactDFA):
+            automaton = CompactDFA.from_automaton(automaton)
+        self.compact = automaton
+        self.chunk_size = chunk_size
+        self.classes = classes
+
+        # Tabela com uma coluna extra (k) para símbolos fora do alfabeto, que levam ao estado morto
+        n, k = len(automaton.states), len(automaton.symbols)
+        self.width = k + 1
+        self.table = array("i", [CompactDFA.DEAD]) * (n * self.width)
+        for q in range(n):
+            self.table[q * self.width:q * self.width + k] = array("i", automaton.table[q * k:(q + 1) * k])
+
+    def chunks(self, source):
+        """Gera blocos de no máximo chunk_size unidades; buffers são fatiados por memoryview, sem cópia."""
+        if isinstance(source, str):
+            for start in range(0, len(source), self.chunk_size):
+                yield source[start:start + self.chunk_size]
+            return
+
+        try:
+            view = memoryview(source)
+        except TypeError:
+            # Objeto de arquivo (texto ou binário)
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            for start in range(0, len(view), self.chunk_size):
+                yield view[start:start + self.chunk_size]
+
+    def code_table(self, separator=None):
+        if separator is not None and not isinstance(separator, str):
+            separator = chr(separator[0])
+        return SymbolCodeTable(self.compact.symbol_index, self.width - 1, self.classes, separator)
+
+    def codes(self, source, separator=None):
+        """Gera, bloco a bloco, a lista de números de símbolo; o separador (se houver) vira o código k + 1."""
+        code_of = self.code_table(separator)
+        byte_codes = [code_of[chr(b)] for b in range(256)]
+
+        for chunk in self.chunks(source):
+            if isinstance(chunk, str):
+                yield [code_of[char] for char in chunk]
+            else:
+                yield [byte_codes[b] for b in chunk]
+
+    def records(self, source, separator="\n"):
+        """Gera (início, fim) de cada registro aceito; os registros são delimitados pelo separador."""
+        table, width, final = self.table, self.width, self.compact.final
+        dead = CompactDFA.DEAD
+        separator_code = width
+        initial = self.compact.initial_state if self.compact.states else dead
+
+        state = initial
+        start = offset = 0
+        for codes in self.codes(source, separator):
+            for i, code in enumerate(codes):
+                if code == separator_code:
+                    if state != dead and final[state]:
+                        yield start, offset + i
+                    state = initial
+                    start = offset + i + 1
+                elif state != dead:
+                    state = table[state * width + code]
+            offset += len(codes)
+
+        if start < offset and state != dead and final[state]:
+            yield start, offset
+
+    def search(self, source, cache_size=4096):
+        """
+        Gera o offset final de cada ocorrência não vazia da linguagem em qualquer ponto da entrada.
+        Simula Σ*·L pelo conjunto de estados ativos, memorizando as transições desses conjuntos.
+        """
+        table, width, final = self.table, self.width, self.compact.final
+        dead = CompactDFA.DEAD
+        if not self.compact.states:
+            return
+        initial = frozenset([self.compact.initial_state])
+        cache = {}
+
+        active = initial
+        offset = 0
+        for codes in self.codes(source):
+            for i, code in enumerate(codes):
+                key = (active, code)
+                result = cache.get(key)
+                if result is None:
+                    targets = {table[q * width + code] for q in active}
+                    targets.discard(dead)
+                    matched = any(final[q] for q in targets)
+                    targets.add(self.compact.initial_state)
+                    result = (frozenset(targets), matched)
+                    if len(cache) >= cache_size:
+                        cache.clear()
+                    cache[key] = result
+                active, matched = result
+                if matched:
+                    yield offset + i + 1
+            offset += len(codes)
+
+
+SCAN_WORKER = {}  # Tabela do AFD carregada uma vez em cada processo trabalhador
+
+
+def init_scan_worker(table, width, states, symbol_index, classes=None):
+    SCAN_WORKER["table"] = table
+    SCAN_WORKER["width"] = width
+    SCAN_WORKER["states"] = states
+    SCAN_WORKER["code_of"] = code_of = SymbolCodeTable(symbol_index, width - 1, classes)
+    byte_codes = [code_of[chr(b)] for b in range(256)]
+    if width <= 256:
+        # Tradução byte -> código feita em C
+        table_bytes = bytes(byte_codes)
+        SCAN_WORKER["byte_codes"] = lambda data: data.translate(table_bytes)
+    else:
+        SCAN_WORKER["byte_codes"] = lambda data: [byte_codes[b] for b in data]
+
+
+def scan_chunk(task):
+    """
+    Executa um bloco a partir de todos os estados ao mesmo tempo e devolve o mapeamento
+    estado inicial → estado final do bloco (DEAD incluso). Os caminhos que convergem são
+    fundidos periodicamente, então o custo cai para o número de estados ainda distintos.
+    """
+    kind, source, start, end = task
+    table, width = SCAN_WORKER["table"], SCAN_WORKER["width"]
+    dead = CompactDFA.DEAD
+
+    if kind == "path":
+        with open(source, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            codes = SCAN_WORKER["byte_codes"](buffer[start:end])
+    elif isinstance(source, str):
+        code_of = SCAN_WORKER["code_of"]
+        codes = [code_of[char] for char in source]
+    else:
+        codes = SCAN_WORKER["byte_codes"](bytes(source))
+
+    current = list(range(SCAN_WORKER["states"]))   # estados distintos ainda em andamento
+    owner = list(range(SCAN_WORKER["states"]))     # estado de partida -> posição em current
+    i = 0
+    while len(current) > 1 and i < len(codes):
+        code = codes[i]
+        current = [table[q * width + code] if q != dead else dead for q in current]
+        i += 1
+        if i % 16 == 0 or i == len(codes):
+            distinct = {}
+            remap = [distinct.setdefault(q, len(distinct)) for q in current]
+            current = list(distinct)
+            owner = [remap[j] for j in owner]
+
+    # Todos os caminhos convergiram: basta seguir um único estado
+    if len(current) == 1:
+        q = current[0]
+        for code in codes[i:] if i else codes:
+            if q == dead:
+                break
+            q = table[q * width + code]
+        current = [q]
+
+    return [current[j] for j in owner]
+
+
+class ParallelDFAScanner:
+    """
+    Percorre entradas grandes com um AFD dividindo-as em blocos processados em paralelo.
+    Cada trabalhador devolve o mapeamento estado → estado do seu bloco (executado a partir de
+    todos os estados); o processo pai compõe os mapeamentos em ordem e obtém o estado final exato.
+    """
+    def __init__(self, automaton, workers=None, chunk_size=1 << 22, classes=None):
+        self.matcher = DFAStreamMatcher(automaton, classes=classes)
+        self.compact = self.matcher.compact
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def tasks(self, source):
+        """
+        Um caminho (os.PathLike, por exemplo pathlib.Path) é lido via mmap pelos próprios trabalhadores;
+        str e buffers são sempre texto de entrada, fatiados aqui.
+        """
+        if isinstance(source, os.PathLike):
+            size = os.path.getsize(source)
+            for start in range(0, size, self.chunk_size):
+                yield ("path", os.fspath(source), start, min(start + self.chunk_size, size))
+        else:
+            for start in range(0, len(source), self.chunk_size):
+                yield ("data", source[start:start + self.chunk_size], 0, 0)
+
+    def final_state(self, source):
+        """Número do estado alcançado ao consumir toda a entrada (ou DEAD)."""
+        dead = CompactDFA.DEAD
+        if not self.compact.states:
+            return dead
+
+        state = self.compact.initial_state
+        initargs = (self.matcher.table, self.matcher.width, len(self.compact.states), self.compact.symbol_index, self.matcher.classes)
+        with ProcessPoolExecutor(self.workers, initializer=init_scan_worker, initargs=initargs) as executor:
+            # Janela de no máximo workers * 2 blocos em andamento: executor.map consumiria todas as tarefas
+            # de uma vez, fatiando e serializando a entrada inteira antes do primeiro resultado
+            pending = deque()
+            for task in self.tasks(source):
+                pending.append(executor.submit(scan_chunk, task))
+                if len(pending) >= self.workers * 2:
+                    mapping = pending.popleft().result()
+                    if state != dead:
+                        state = mapping[state]
+            while pending:
+                mapping = pending.popleft().result()
+                if state != dead:
+                    state = mapping[state]
+        return state
+
+    def accepts(self, source):
+        state = self.final_state(source)
+        return state != CompactDFA.DEAD and bool(self.compact.final[state])
+
+
+class BinaryAutomatonFormat:
+    """
+    Formato binário compacto para AFD e AFND, compilado uma vez e carregado rapidamente:
+        cabeçalho   magic, versão, tipo (0 = AFD, 1 = AFND), n estados, k símbolos,
+                    estado inicial, número de arestas (só AFND) e tamanho dos textos
+        textos      offsets uint32 (k + n + 1) e, em seguida, símbolos e nomes de estados em UTF-8
+        finais      n bytes (1 = estado final)
+        transições  AFD: tabela int32 n·k (DEAD = -1); AFND: offsets int32 (n·k + 1) e destinos int32
+    Toda seção começa alinhada em 4 bytes, então as tabelas podem ser usadas direto de um mmap.
+    O estado inicial é gravado no cabeçalho (o AFND e o AFD numerado por from_automaton usam o 0),
+    e os nomes dos estados são gravados já formatados por format_set.
+    """
+    MAGIC = b"INEA"
+    VERSION = 1
+    DFA = 0
+    NFA = 1
+    HEADER = struct.Struct("<4sHHIIiII")
+
+    @staticmethod
+    def padding(size):
+        return b"\0" * (-size % 4)
+
+    @staticmethod
+    def dump(automaton, path):
+        """Grava um DeterministicFiniteAutomaton, CompactDFA ou NonDeterministicFiniteAutomaton."""
+        if isinstance(automaton, NonDeterministicFiniteAutomaton):
+            kind = BinaryAutomatonFormat.NFA
+            names = [automaton.initial_state]
+            names.extend(state for state in automaton.states if state != automaton.initial_state)
+            seen = set(names)
+            for (state, _), next_states in automaton.transitions.items():
+                for name in [state, *next_states]:
+                    if name not in seen:
+                        seen.add(name)
+                        names.append(name)
+            index = {name: i for i, name in enumerate(names)}
+            symbols = sorted(set(automaton.alphabet) | {symbol for (_, symbol) in automaton.transitions})
+            final = bytes(name in automaton.final_states for name in names)
+
+            offsets, targets = array("i", [0]), array("i")
+            for name in names:
+                for symbol in symbols:
+                    targets.extend(sorted(index[next_state] for next_state in automaton.transitions.get((name, symbol), ())))
+                    offsets.append(len(targets))
+            tables = [offsets, targets]
+            edges = len(targets)
+            initial = 0
+        else:
+            kind = BinaryAutomatonFormat.DFA
+            if not isinstance(automaton, CompactDFA):
+                automaton = CompactDFA.from_automaton(automaton)
+            names = [state.name for state in automaton.states]
+            symbols = automaton.symbols
+            final = bytes(automaton.final)
+            tables = [array("i", automaton.table)]
+            edges = 0
+            initial = automaton.initial_state  # Um CompactDFA montado à mão pode começar em outro estado
+
+        texts = [symbol.encode() for symbol in symbols] + [format_set(name).encode() for name in names]
+        text_offsets = array("I", [0])
+        for text in texts:
+            text_offsets.append(text_offsets[-1] + len(text))
+        blob = b"".join(texts)
+
+        header = BinaryAutomatonFormat.HEADER.pack(BinaryAutomatonFormat.MAGIC, BinaryAutomatonFormat.VERSION, kind,
+                                                   len(names), len(symbols), initial, edges, len(blob))
+        with open(path, "wb") as file:
+            file.write(header)
+            file.write(text_offsets.tobytes())
+            file.write(blob + BinaryAutomatonFormat.padding(len(blob)))
+            file.write(final + BinaryAutomatonFormat.padding(len(final)))
+            for table in tables:
+                file.write(table.tobytes())
+
+    @staticmethod
+    def read_sections(buffer):
+        """Separa as seções de um buffer já carregado (bytes ou mmap) sem copiar as tabelas."""
+        view = memoryview(buffer)
+        magic, version, kind, n, k, initial, edges, blob_size = BinaryAutomatonFormat.HEADER.unpack_from(view, 0)
+        if magic != BinaryAutomatonFormat.MAGIC or version != BinaryAutomatonFormat.VERSION:
+            raise ValueError("Arquivo de autômato binário inválido ou de versão incompatível.")
+
+        position = BinaryAutomatonFormat.HEADER.size
+        text_offsets = view[position:position + 4 * (k + n + 1)].cast("I")
+        position += 4 * (k + n + 1)
+        blob = bytes(view[position:position + blob_size])
+        texts = [blob[text_offsets[i]:text_offsets[i + 1]].decode() for i in range(k + n)]
+        position += blob_size + len(BinaryAutomatonFormat.padding(blob_size))
+        final = view[position:position + n]
+        position += n + len(BinaryAutomatonFormat.padding(n))
+
+        if kind == BinaryAutomatonFormat.DFA:
+            tables = [view[position:position + 4 * n * k].cast("i")]
+        else:
+            offsets = view[position:position + 4 * (n * k + 1)].cast("i")
+            position += 4 * (n * k + 1)
+            tables = [offsets, view[position:position + 4 * edges].cast("i")]
+        return kind, texts[:k], texts[k:], initial, final, tables
+
+    @staticmethod
+    def load_compact(path, use_mmap=True):
+        """
+        Carrega um AFD como CompactDFA. Com use_mmap, a tabela de transições é lida direto do
+        arquivo mapeado em memória (sem cópia); caso contrário é copiada para um array('i').
+        """
+        with open(path, "rb") as file:
+            if use_mmap:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = file.read()
+
+        kind, symbols, names, initial, final, tables = BinaryAutomatonFormat.read_sections(buffer)
+        if kind != BinaryAutomatonFormat.DFA:
+            raise ValueError("O arquivo contém um AFND; use BinaryAutomatonFormat.load.")
+        table = tables[0] if use_mmap else array("i", tables[0].tobytes())
+        states = [CompactState(i, name, bool(final[i])) for i, name in enumerate(names)]
+        return CompactDFA(states, symbols, table, initial)
+
+    @staticmethod
+    def load(path):
+        """Carrega o arquivo como DeterministicFiniteAutomaton ou NonDeterministicFiniteAutomaton."""
+        with open(path, "rb") as file:
+            buffer = file.read()
+
+        kind, symbols, names, initial, final, tables = BinaryAutomatonFormat.read_sections(buffer)
+        if kind == BinaryAutomatonFormat.DFA:
+            table = array("i", tables[0].tobytes())
+            states = [CompactState(i, name, bool(final[i])) for i, name in enumerate(names)]
+            return CompactDFA(states, symbols, table, initial).to_automaton()
+
+        offsets, targets = tables
+        transitions = {}
+        for q, name in enumerate(names):
+            for c, symbol in enumerate(symbols):
+                row = q * len(symbols) + c
+                if offsets[row] != offsets[row + 1]:
+                    transitions[(name, symbol)] = {names[t] for t in targets[offsets[row]:offsets[row + 1]]}
+        final_states = {name for q, name in enumerate(names) if final[q]}
+        return NonDeterministicFiniteAutomaton(set(names), names[initial], final_states, set(symbols), transitions)
+
+
 class Node:
     """Classe para representar um nó na árvore de expressão regular."""
+    __slots__ = ("value", "left", "right")
+
     def __init__(self, value, left=None, right=None):
         self.value = value  # Operador ou operando
         self.left = left    # Subárvore à esquerda
@@ -181,42 +1370,293 @@ class Node:
         return self.value
 
 
+class NodeArena:
+    """
+    Fábrica de nós com hash-consing: como os filhos já são canônicos, dois nós são iguais quando
+    têm o mesmo valor e os mesmos objetos como filhos, então subárvores idênticas viram um único
+    Node e a árvore da regex é na verdade um DAG.
+    """
+    def __init__(self):
+        self.nodes = {}  # (valor, esquerda, direita) -> Node
+
+    def make(self, value, left=None, right=None):
+        key = (value, left, right)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = Node(value, left, right)
+        return node
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+class SymbolClasses:
+    """
+    Partição do alfabeto (todos os caracteres Unicode) em classes disjuntas: dois caracteres ficam
+    na mesma classe quando pertencem exatamente aos mesmos conjuntos de caracteres usados pelas
+    regex. Os autômatos usam o rótulo de cada classe como símbolo, então as tabelas de transição
+    têm uma coluna por classe e não por caractere.
+    """
+    MAX_CODE_POINT = 0x10FFFF
+    SPECIAL = set("&.|*+?()[]\\")
+
+    def __init__(self, charsets):
+        charsets = list(dict.fromkeys(charsets))  # remove repetidos, mantendo a ordem
+
+        cuts = {0, self.MAX_CODE_POINT + 1}
+        for ranges in charsets:
+            for low, high in ranges:
+                cuts.add(low)
+                cuts.add(high + 1)
+        self.cuts = sorted(cuts)  # o intervalo elementar j é [cuts[j], cuts[j + 1])
+
+        # Assinatura de cada intervalo elementar: quais conjuntos o contêm
+        signatures = [0] * (len(self.cuts) - 1)
+        for bit, ranges in enumerate(charsets):
+            for low, high in ranges:
+                for j in range(bisect_left(self.cuts, low), bisect_left(self.cuts, high + 1)):
+                    signatures[j] |= 1 << bit
+
+        class_of_signature = {}
+        self.interval_class = []
+        self.class_ranges = []
+        for j, signature in enumerate(signatures):
+            if signature not in class_of_signature:
+                class_of_signature[signature] = len(self.class_ranges)
+                self.class_ranges.append([])
+            c = class_of_signature[signature]
+            self.class_ranges[c].append((self.cuts[j], self.cuts[j + 1] - 1))
+            self.interval_class.append(c)
+
+        self.labels = [self.label(ranges) for ranges in self.class_ranges]
+        self.class_of_label = {label: c for c, label in enumerate(self.labels)}
+
+    @staticmethod
+    def normalize(ranges):
+        """Ordena e funde intervalos (low, high) de códigos de caracteres."""
+        result = []
+        for low, high in sorted(ranges):
+            if result and low <= result[-1][1] + 1:
+                result[-1] = (result[-1][0], max(result[-1][1], high))
+            else:
+                result.append((low, high))
+        return tuple(result)
+
+    @staticmethod
+    def complement(ranges):
+        result = []
+        next_low = 0
+        for low, high in SymbolClasses.normalize(ranges):
+            if low > next_low:
+                result.append((next_low, low - 1))
+            next_low = high + 1
+        if next_low <= SymbolClasses.MAX_CODE_POINT:
+            result.append((next_low, SymbolClasses.MAX_CODE_POINT))
+        return tuple(result)
+
+    def label(self, ranges):
+        """Rótulo da classe: o próprio caractere, se for um só e comum; senão a forma [..] entre colchetes."""
+        if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+            char = chr(ranges[0][0])
+            if char not in self.SPECIAL and char.isprintable():
+                return char
+
+        def render(code):
+            char = chr(code)
+            if char in "]\\-^":
+                return "\\" + char
+            if not char.isprintable():
+                return f"\\u{{{code:x}}}"
+            return char
+
+        parts = []
+        for low, high in ranges:
+            parts.append(render(low) if low == high else f"{render(low)}-{render(high)}")
+        return "[" + "".join(parts) + "]"
+
+    def classes_of(self, ranges):
+        """Classes cobertas pelo conjunto de caracteres; o conjunto precisa ser uma união de classes."""
+        classes = set()
+        for low, high in ranges:
+            first, last = bisect_right(self.cuts, low) - 1, bisect_left(self.cuts, high + 1)
+            if self.cuts[first] != low or last >= len(self.cuts) or self.cuts[last] != high + 1:
+                raise ValueError("Conjunto de caracteres não é uma união de classes desta partição.")
+            classes.update(self.interval_class[first:last])
+        return sorted(classes)
+
+    def classify(self, char):
+        """Rótulo da classe do caractere (o símbolo que os autômatos usam para ele)."""
+        return self.labels[self.interval_class[bisect_right(self.cuts, ord(char)) - 1]]
+
+    def translate(self, text):
+        return [self.classify(char) for char in text]
+
+
 class Regex:
-    def __init__(self, regex):
-        """Inicializa a regex e constrói a árvore da expressão regular."""
-        self.regex = regex
+    OPERATORS = {'|', '*', '+', '?', '.', '(', ')'}
+    ESCAPES = {
+        'n': ((10, 10),),
+        't': ((9, 9),),
+        'r': ((13, 13),),
+        'd': ((48, 57),),
+        'w': ((48, 57), (65, 90), (95, 95), (97, 122)),
+        's': ((9, 13), (32, 32)),
+    }
+    ANY = ((0, 9), (11, SymbolClasses.MAX_CODE_POINT))  # '.' da entrada: qualquer caractere exceto '\n'
+
+    def __init__(self, regex, classes=None, arena=None):
+        """
+        Inicializa a regex e constrói a árvore da expressão regular.
+        Aceita qualquer caractere, escapes com '\\', classes [...] (inclusive [^...]), '.', '+' e '?';
+        '&' é a palavra vazia. Os operandos são trocados pelos rótulos das classes de símbolos
+        (partição própria ou a recebida em classes, compartilhada entre várias regex).
+        Os nós são criados em arena (NodeArena), que pode ser compartilhada para reaproveitar subárvores.
+        """
+        self.source = regex
+        self.arena = arena if arena is not None else NodeArena()
+        tokens = self.tokenize(regex)
+        if classes is None:
+            classes = SymbolClasses(token for token in tokens if isinstance(token, tuple))
+        self.classes = classes
+        self.regex = self.lower(tokens)
         self.regex = self.insert_concatenation(self.regex)
         self.postfix = self.to_postfix(self.regex)
         self.tree = self.build_tree(self.postfix)
 
+    @classmethod
+    def tokenize(cls, regex):
+        """Separa a regex de entrada em operadores, '&' e conjuntos de caracteres (tuplas de intervalos)."""
+        tokens = []
+        i = 0
+        while i < len(regex):
+            char = regex[i]
+            if char == '\\':
+                ranges, i = cls.parse_escape(regex, i + 1)
+                tokens.append(ranges)
+                continue
+            if char == '[':
+                ranges, i = cls.parse_class(regex, i + 1)
+                tokens.append(ranges)
+                continue
+
+            if char == '.':
+                tokens.append(cls.ANY)
+            elif char in cls.OPERATORS or char == '&':
+                tokens.append(char)
+            else:
+                tokens.append(((ord(char), ord(char)),))
+            i += 1
+        return tokens
+
+    @classmethod
+    def parse_escape(cls, regex, i):
+        if i >= len(regex):
+            raise ValueError("Escape incompleto no fim da regex.")
+        char = regex[i]
+        return cls.ESCAPES.get(char, ((ord(char), ord(char)),)), i + 1
+
+    @classmethod
+    def parse_class(cls, regex, i):
+        """Lê uma classe [...] a partir do caractere após '['; devolve os intervalos e a posição após ']'."""
+        negate = i < len(regex) and regex[i] == '^'
+        if negate:
+            i += 1
+
+        ranges = []
+        first = True
+        while True:
+            if i >= len(regex):
+                raise ValueError("Classe de caracteres sem ']' na regex.")
+            char = regex[i]
+            if char == ']' and not first:
+                i += 1
+                break
+            first = False
+
+            if char == '\\':
+                item, i = cls.parse_escape(regex, i + 1)
+            else:
+                item, i = ((ord(char), ord(char)),), i + 1
+
+            # Intervalo a-b (só entre caracteres simples; '-' no fim da classe é literal)
+            if len(item) == 1 and item[0][0] == item[0][1] and i + 1 < len(regex) and regex[i] == '-' and regex[i + 1] != ']':
+                if regex[i + 1] == '\\':
+                    end, i = cls.parse_escape(regex, i + 2)
+                else:
+                    end, i = ((ord(regex[i + 1]), ord(regex[i + 1])),), i + 2
+                if len(end) != 1 or end[0][0] != end[0][1] or end[0][0] < item[0][0]:
+                    raise ValueError("Intervalo inválido em classe de caracteres.")
+                item = ((item[0][0], end[0][0]),)
+            ranges.extend(item)
+
+        ranges = SymbolClasses.normalize(ranges)
+        return (SymbolClasses.complement(ranges) if negate else ranges), i
+
+    @classmethod
+    def shared_classes(cls, regexes):
+        """Partição de símbolos comum a várias regex, para compilá-las sobre o mesmo alfabeto."""
+        return SymbolClasses(token for regex in regexes for token in cls.tokenize(regex) if isinstance(token, tuple))
+
+    def lower(self, tokens):
+        """Troca cada conjunto de caracteres pelo rótulo da sua classe, ou pela união dos rótulos se cobrir várias."""
+        result = []
+        for token in tokens:
+            if not isinstance(token, tuple):
+                result.append(token)
+                continue
+            labels = [self.classes.labels[c] for c in self.classes.classes_of(token)]
+            if not labels:
+                raise ValueError("Classe de caracteres vazia na regex.")
+            result.append(labels[0] if len(labels) == 1 else "(" + "|".join(labels) + ")")
+        return ''.join(result)
+
+    @staticmethod
+    def split_units(regex):
+        """Divide a forma interna em unidades: um rótulo [..] inteiro ou um único caractere."""
+        units = []
+        i = 0
+        while i < len(regex):
+            if regex[i] == '[':
+                j = i + 1
+                while j < len(regex) and regex[j] != ']':
+                    j += 2 if regex[j] == '\\' else 1
+                if j >= len(regex):
+                    raise ValueError("Rótulo de classe sem ']' na regex.")
+                units.append(regex[i:j + 1])
+                i = j + 1
+            else:
+                units.append(regex[i])
+                i += 1
+        return units
+
     def insert_concatenation(self, regex):
         """Insere operadores de concatenação explícitos ('.') na regex."""
         result = []
-        operators = {'|', '*', ')'}
-        for i in range(len(regex)):
-            c1 = regex[i]
+        units = self.split_units(regex)
+        for i in range(len(units)):
+            c1 = units[i]
             result.append(c1)
-            if i + 1 < len(regex):
-                c2 = regex[i + 1]
+            if i + 1 < len(units):
+                c2 = units[i + 1]
                 if (c1 not in {'|', '(',} and
-                    c2 not in {'|', '*', ')'}):
+                    c2 not in {'|', '*', '+', '?', ')'}):
                     result.append('.')
         return ''.join(result)
 
     def to_postfix(self, regex):
         """Converte a regex da notação infixa para pós-fixa usando o algoritmo Shunting Yard."""
-        precedence = {'*': 3, '.': 2, '|': 1}
-        associativity = {'*': 'right', '.': 'right', '|': 'left'}
+        precedence = {'*': 3, '+': 3, '?': 3, '.': 2, '|': 1}
+        associativity = {'*': 'right', '+': 'right', '?': 'right', '.': 'right', '|': 'left'}
         output = []
         stack_char = []
-        for char in regex:
-            if char in {'a', 'b', '&'}:
-                output.append(char)
-            elif char == '(':
+        for char in self.split_units(regex):
+            if char == '(':
                 stack_char.append(char)
             elif char == ')':
                 while stack_char and stack_char[-1] != '(':
                     output.append(stack_char.pop())
+                if not stack_char:
+                    raise ValueError("Parênteses não balanceados na regex.")
                 stack_char.pop()  # Remove '('
             elif char in precedence:
                 while (stack_char and stack_char[-1] != '(' and
@@ -225,7 +1665,7 @@ class Regex:
                     output.append(stack_char.pop())
                 stack_char.append(char)
             else:
-                raise ValueError(f"Caractere inválido na regex: {char}")
+                output.append(char)
         while stack_char:
             if stack_char[-1] == '(' or stack_char[-1] == ')':
                 raise ValueError("Parênteses não balanceados na regex.")
@@ -235,31 +1675,64 @@ class Regex:
     def build_tree(self, postfix):
         """Constrói a árvore de expressão regular a partir da notação pós-fixa."""
         stack_char = []
-        for char in postfix:
-            if char in {'a', 'b', '&'}:
-                stack_char.append(Node(char))
-            elif char == '*':
+        for char in self.split_units(postfix):
+            if char in {'*', '+', '?'}:
+                if not stack_char:
+                    raise ValueError(f"Operador '{char}' sem operando na regex.")
                 operand = stack_char.pop()
-                stack_char.append(Node(char, left=operand))
+                stack_char.append(self.arena.make(char, operand))
             elif char in {'.', '|'}:
+                if len(stack_char) < 2:
+                    raise ValueError(f"Operador '{char}' sem operandos na regex.")
                 right = stack_char.pop()
                 left = stack_char.pop()
-                stack_char.append(Node(char, left, right))
-            else:
+                stack_char.append(self.arena.make(char, left, right))
+            elif char in {'(', ')'}:
                 raise ValueError(f"Caractere inválido na notação pós-fixa: {char}")
+            else:
+                stack_char.append(self.arena.make(char))
         if len(stack_char) != 1:
             raise ValueError("Erro na construção da árvore: pilha final não possui apenas a raiz.")
         return stack_char[0]
 
+    @staticmethod
+    def iter_post_order(node, shared=False):
+        """
+        Gera os nós em pós-ordem, com pilha explícita (sem recursão). Com shared=True cada subárvore
+        compartilhada é gerada uma única vez (ordem topológica do DAG), útil para memorizar por nó.
+        """
+        seen = set()
+        stack = [(node, False)] if node is not None else []
+        while stack:
+            current, expanded = stack.pop()
+            if expanded:
+                yield current
+                continue
+            if shared:
+                if current in seen:
+                    continue
+                seen.add(current)
+            stack.append((current, True))
+            if current.right is not None:
+                stack.append((current.right, False))
+            if current.left is not None:
+                stack.append((current.left, False))
+
+    @staticmethod
+    def iter_pre_order(node):
+        """Gera os nós em pré-ordem, com pilha explícita (sem recursão)."""
+        stack = [node] if node is not None else []
+        while stack:
+            current = stack.pop()
+            yield current
+            if current.right is not None:
+                stack.append(current.right)
+            if current.left is not None:
+                stack.append(current.left)
+
     def post_order(self, node):
         """Percorre a árvore em ordem pós-fixa e retorna uma lista dos valores."""
-        if node is None:
-            return []
-        result = []
-        result += self.post_order(node.left)
-        result += self.post_order(node.right)
-        result.append(node.value)
-        return result
+        return [current.value for current in self.iter_post_order(node)]
 
     def regex_to_post_order_string(self):
         """Retorna a expressão em pós-ordem como uma string."""
@@ -305,6 +1778,7 @@ class RegexProcessor:
         new_transitions = b_automate.transitions | a_automate.transitions | {(list(a_automate.final_states)[0], '&'): {b_automate.initial_state}}
         
         result = NonDeterministicFiniteAutomaton(new_states, new_initial_state, new_final_state, new_alphabet, new_transitions)
+        result.inherit_closure_cache(a_automate, b_automate)
         self.stack_automate.append(result)
 
     def union(self):
@@ -326,6 +1800,7 @@ class RegexProcessor:
                                                       (list(a_automate.final_states)[0], '&') : {str(self.max_state_value + 2)}}
         self.max_state_value += 2
         result = NonDeterministicFiniteAutomaton(new_states, new_initial_state, new_final_state, new_alphabet, new_transitions)
+        result.inherit_closure_cache(a_automate, b_automate)
         self.stack_automate.append(result)
 
     def kleene_star(self):
@@ -341,17 +1816,66 @@ class RegexProcessor:
                                                     (list(a_automate.final_states)[0], '&') : {str(self.max_state_value + 2), a_automate.initial_state}}
         self.max_state_value += 2
         result = NonDeterministicFiniteAutomaton(new_states, new_initial_state, new_final_state, new_alphabet, new_transitions)
+        result.inherit_closure_cache(a_automate)
+        self.stack_automate.append(result)
+
+
+    def kleene_plus(self):
+        a = self.stack_char.pop()
+        result = f"{a}+"
+        self.stack_char.append(result)
+        a_automate = self.stack_automate.pop()
+        new_states = a_automate.states.union({str(self.max_state_value + 1), str(self.max_state_value + 2)})
+        new_initial_state = str(self.max_state_value + 1)
+        new_final_state = {str(self.max_state_value + 2)}
+        new_alphabet = a_automate.alphabet
+        new_transitions = a_automate.transitions | {(str(self.max_state_value + 1), '&') : {a_automate.initial_state}, \
+                                                    (list(a_automate.final_states)[0], '&') : {str(self.max_state_value + 2), a_automate.initial_state}}
+        self.max_state_value += 2
+        result = NonDeterministicFiniteAutomaton(new_states, new_initial_state, new_final_state, new_alphabet, new_transitions)
+        result.inherit_closure_cache(a_automate)
         self.stack_automate.append(result)
 
+    def optional(self):
+        a = self.stack_char.pop()
+        result = f"{a}?"
+        self.stack_char.append(result)
+        a_automate = self.stack_automate.pop()
+        new_states = a_automate.states.union({str(self.max_state_value + 1), str(self.max_state_value + 2)})
+        new_initial_state = str(self.max_state_value + 1)
+        new_final_state = {str(self.max_state_value + 2)}
+        new_alphabet = a_automate.alphabet
+        new_transitions = a_automate.transitions | {(str(self.max_state_value + 1), '&') : {a_automate.initial_state, str(self.max_state_value + 2)}, \
+                                                    (list(a_automate.final_states)[0], '&') : {str(self.max_state_value + 2)}}
+        self.max_state_value += 2
+        result = NonDeterministicFiniteAutomaton(new_states, new_initial_state, new_final_state, new_alphabet, new_transitions)
+        result.inherit_closure_cache(a_automate)
+        self.stack_automate.append(result)
 
-    def get_ndfa_from_regex(self, expression):
-        for char in expression:
+    def get_ndfa_from_regex(self, expression, method="fragments"):
+        """
+        Constrói o AFND de Thompson a partir da regex em pós-ordem. O método "fragments" acumula
+        todas as transições numa única lista e guarda na pilha só (inicial, final) de cada fragmento,
+        criando o NonDeterministicFiniteAutomaton uma vez no fim (tempo linear no tamanho da regex);
+        "reference" monta um autômato novo a cada operador, copiando estados e transições.
+        Os dois produzem o mesmo AFND (mesmos nomes de estados).
+        """
+        if method == "fragments":
+            return self.build_from_fragments(expression)
+        if method != "reference":
+            raise ValueError(f"Método de construção desconhecido: {method}")
+
+        for char in Regex.split_units(expression):
             if char == '.':  
                 self.concatenate()
             elif char == '|':  
                 self.union()
             elif char == '*': 
                 self.kleene_star()
+            elif char == '+':
+                self.kleene_plus()
+            elif char == '?':
+                self.optional()
             else:
                 automate = NonDeterministicFiniteAutomaton(
                     {str(self.max_state_value + 1), str(self.max_state_value + 2)},
@@ -366,6 +1890,557 @@ class RegexProcessor:
 
         return self.stack_automate.pop()
 
+    def build_from_fragments(self, expression):
+        edges = []       # (origem, símbolo, destino), estados como inteiros
+        alphabet = set()
+        fragments = []   # pilha de (inicial, final)
+        first_state = self.max_state_value + 1
+        n = self.max_state_value
+
+        for char in Regex.split_units(expression):
+            if char == '.':
+                b_start, b_accept = fragments.pop()
+                a_start, a_accept = fragments.pop()
+                edges.append((a_accept, '&', b_start))
+                fragments.append((a_start, b_accept))
+                continue
+
+            start, accept = n + 1, n + 2
+            if char == '|':
+                b_start, b_accept = fragments.pop()
+                a_start, a_accept = fragments.pop()
+                edges.extend(((start, '&', b_start), (start, '&', a_start), (b_accept, '&', accept), (a_accept, '&', accept)))
+            elif char == '*':
+                a_start, a_accept = fragments.pop()
+                edges.extend(((start, '&', a_start), (start, '&', accept), (a_accept, '&', accept), (a_accept, '&', a_start)))
+            elif char == '+':
+                a_start, a_accept = fragments.pop()
+                edges.extend(((start, '&', a_start), (a_accept, '&', accept), (a_accept, '&', a_start)))
+            elif char == '?':
+                a_start, a_accept = fragments.pop()
+                edges.extend(((start, '&', a_start), (start, '&', accept), (a_accept, '&', accept)))
+            else:
+                edges.append((start, char, accept))
+                alphabet.add(char)
+            fragments.append((start, accept))
+            n += 2
+
+        start, accept = fragments.pop()
+        transitions = {}
+        for origin, symbol, target in edges:
+            key = (str(origin), symbol)
+            if key not in transitions:
+                transitions[key] = set()
+            transitions[key].add(str(target))
+
+        self.max_state_value = n
+        states = {str(state) for state in range(first_state, n + 1)}
+        return NonDeterministicFiniteAutomaton(states, str(start), {str(accept)}, alphabet, transitions)
+
+
+
+class DirectDFABuilder:
+    """
+    Constrói o AFD direto da árvore da regex (autômato de posições), sem passar por um AFND com
+    transições &: calcula nullable/firstpos/lastpos de cada nó e followpos de cada posição,
+    com os conjuntos de posições representados como máscaras de bits. A regex é aumentada com
+    um marcador de fim; os estados do AFD são os conjuntos de posições (nomeados pelos números).
+    """
+    def __init__(self):
+        self.symbols = []      # symbols[p] = símbolo da posição p (None para o marcador de fim)
+        self.followpos = []    # followpos[p] = máscara das posições que podem seguir p
+
+    def new_position(self, symbol):
+        self.symbols.append(symbol)
+        self.followpos.append(0)
+        return len(self.symbols) - 1
+
+    def add_follow(self, positions, follow):
+        while positions:
+            low_bit = positions & -positions
+            self.followpos[low_bit.bit_length() - 1] |= follow
+            positions ^= low_bit
+
+    def compute(self, tree):
+        """Percorre a árvore em pós-ordem (iterativa, cada ocorrência de folha é uma posição) e devolve (nullable, firstpos, lastpos)."""
+        values = []
+        for node in Regex.iter_post_order(tree):
+            if node.value == '&':
+                values.append((True, 0, 0))
+            elif node.value in {'*', '+'}:
+                nullable, first, last = values.pop()
+                self.add_follow(last, first)
+                values.append((nullable or node.value == '*', first, last))
+            elif node.value == '?':
+                _, first, last = values.pop()
+                values.append((True, first, last))
+            elif node.value == '|':
+                right, left = values.pop(), values.pop()
+                values.append((left[0] or right[0], left[1] | right[1], left[2] | right[2]))
+            elif node.value == '.':
+                right, left = values.pop(), values.pop()
+                self.add_follow(left[2], right[1])
+                first = left[1] | right[1] if left[0] else left[1]
+                last = left[2] | right[2] if right[0] else right[2]
+                values.append((left[0] and right[0], first, last))
+            else:
+                position = 1 << self.new_position(node.value)
+                values.append((False, position, position))
+        return values.pop()
+
+    def build(self, tree):
+        nullable, first, last = self.compute(tree)
+
+        # Concatena o marcador de fim à raiz
+        end = 1 << self.new_position(None)
+        self.add_follow(last, end)
+        if nullable:
+            first |= end
+
+        alphabet = {symbol for symbol in self.symbols if symbol is not None}
+        positions_of = {symbol: 0 for symbol in alphabet}
+        for p, symbol in enumerate(self.symbols):
+            if symbol is not None:
+                positions_of[symbol] |= 1 << p
+
+        def name(mask):
+            return frozenset(str(p) for p in range(mask.bit_length()) if mask >> p & 1)
+
+        masks = [first]
+        names = {first: name(first)}
+        new_transitions = {}
+        i = 0
+        while i < len(masks):
+            mask = masks[i]
+            i += 1
+            for symbol in alphabet:
+                positions = mask & positions_of[symbol]
+                next_mask = 0
+                while positions:
+                    low_bit = positions & -positions
+                    next_mask |= self.followpos[low_bit.bit_length() - 1]
+                    positions ^= low_bit
+                if next_mask:
+                    if next_mask not in names:
+                        names[next_mask] = name(next_mask)
+                        masks.append(next_mask)
+                    new_transitions[(names[mask], symbol)] = names[next_mask]
+
+        new_states = [names[mask] for mask in masks]
+        new_final_states = frozenset(names[mask] for mask in masks if mask & end)
+        return DeterministicFiniteAutomaton(new_states, names[first], new_final_states, alphabet, new_transitions)
+
+
+class DerivativeTerm:
+    """Termo de regex único (hash-consed): termos estruturalmente iguais são o mesmo objeto."""
+    __slots__ = ("kind", "value", "left", "right", "nullable", "id")
+
+    def __init__(self, kind, value, left, right, nullable, id):
+        self.kind = kind          # EMPTY, EPSILON, SYMBOL, CONCAT, UNION ou STAR
+        self.value = value        # símbolo (SYMBOL) ou tupla ordenada de alternativas (UNION)
+        self.left = left
+        self.right = right
+        self.nullable = nullable
+        self.id = id
+
+    def __str__(self):
+        if self.kind == DerivativeRegexCompiler.EMPTY:
+            return "∅"
+        if self.kind == DerivativeRegexCompiler.EPSILON:
+            return "&"
+        if self.kind == DerivativeRegexCompiler.SYMBOL:
+            return self.value
+        if self.kind == DerivativeRegexCompiler.STAR:
+            return f"({self.left})*"
+        if self.kind == DerivativeRegexCompiler.CONCAT:
+            return f"{self.left}{self.right}"
+        return "(" + "|".join(str(term) for term in self.value) + ")"
+
+
+class DerivativeRegexCompiler:
+    """
+    Compila regex por derivadas de Brzozowski. Os construtores normalizam união (associativa,
+    comutativa e idempotente), concatenação (associada à direita, com ∅ e & absorvidos) e fecho,
+    e todo termo é hash-consed; assim cada derivada distinta é calculada uma única vez e o AFD
+    resultante costuma ficar próximo do mínimo sem precisar de minimize.
+    """
+    EMPTY, EPSILON, SYMBOL, CONCAT, UNION, STAR = range(6)
+
+    def __init__(self):
+        self.terms = {}           # chave estrutural -> DerivativeTerm
+        self.derivatives = {}     # (id do termo, símbolo) -> DerivativeTerm
+        self.empty = self.make(self.EMPTY, None, None, None, False)
+        self.epsilon = self.make(self.EPSILON, None, None, None, True)
+
+    def make(self, kind, value, left, right, nullable):
+        key = (kind, value, left.id if left else None, right.id if right else None)
+        term = self.terms.get(key)
+        if term is None:
+            term = DerivativeTerm(kind, value, left, right, nullable, len(self.terms))
+            self.terms[key] = term
+        return term
+
+    def symbol(self, symbol):
+        return self.make(self.SYMBOL, symbol, None, None, False)
+
+    def concat(self, left, right):
+        if left is self.empty or right is self.empty:
+            return self.empty
+        if left is self.epsilon:
+            return right
+        if right is self.epsilon:
+            return left
+        # (r·s)·t = r·(s·t): percorre a espinha direita de left sem recursão
+        factors = []
+        while left.kind == self.CONCAT:
+            factors.append(left.left)
+            left = left.right
+        factors.append(left)
+        for factor in reversed(factors):
+            right = self.make(self.CONCAT, None, factor, right, factor.nullable and right.nullable)
+        return right
+
+    def union(self, *terms):
+        alternatives = {}
+        for term in terms:
+            for alternative in (term.value if term.kind == self.UNION else (term,)):
+                if alternative is not self.empty:
+                    alternatives[alternative.id] = alternative
+        if not alternatives:
+            return self.empty
+        if len(alternatives) == 1:
+            return next(iter(alternatives.values()))
+        value = tuple(alternatives[i] for i in sorted(alternatives))
+        key = (self.UNION, tuple(sorted(alternatives)), None, None)
+        term = self.terms.get(key)
+        if term is None:
+            term = DerivativeTerm(self.UNION, value, None, None, any(t.nullable for t in value), len(self.terms))
+            self.terms[key] = term
+        return term
+
+    def star(self, term):
+        if term is self.empty or term is self.epsilon:
+            return self.epsilon
+        if term.kind == self.STAR:
+            return term
+        return self.make(self.STAR, None, term, None, True)
+
+    def from_tree(self, tree):
+        """Converte a árvore de Node da Regex em termo, visitando uma só vez cada subárvore compartilhada."""
+        term_of = {}
+        for node in Regex.iter_post_order(tree, shared=True):
+            if node.value == '&':
+                term = self.epsilon
+            elif node.value == '*':
+                term = self.star(term_of[node.left])
+            elif node.value == '+':
+                term = self.concat(term_of[node.left], self.star(term_of[node.left]))
+            elif node.value == '?':
+                term = self.union(term_of[node.left], self.epsilon)
+            elif node.value == '.':
+                term = self.concat(term_of[node.left], term_of[node.right])
+            elif node.value == '|':
+                term = self.union(term_of[node.left], term_of[node.right])
+            else:
+                term = self.symbol(node.value)
+            term_of[node] = term
+        return term_of[tree]
+
+    def derivative(self, term, symbol):
+        """Derivada do termo pelo símbolo, com pilha explícita: as subderivadas ainda fora do cache vêm antes."""
+        derivatives = self.derivatives
+        stack = [term]
+        while stack:
+            current = stack[-1]
+            key = (current.id, symbol)
+            if key in derivatives:
+                stack.pop()
+                continue
+
+            if current.kind in {self.EMPTY, self.EPSILON}:
+                result = self.empty
+            elif current.kind == self.SYMBOL:
+                result = self.epsilon if current.value == symbol else self.empty
+            else:
+                if current.kind == self.UNION:
+                    children = current.value
+                elif current.kind == self.STAR or not current.left.nullable:
+                    children = (current.left,)
+                else:
+                    children = (current.left, current.right)
+                missing = [child for child in children if (child.id, symbol) not in derivatives]
+                if missing:
+                    stack.extend(missing)
+                    continue
+
+                if current.kind == self.UNION:
+                    result = self.union(*(derivatives[(alternative.id, symbol)] for alternative in current.value))
+                elif current.kind == self.STAR:
+                    result = self.concat(derivatives[(current.left.id, symbol)], current)
+                else:
+                    result = self.concat(derivatives[(current.left.id, symbol)], current.right)
+                    if current.left.nullable:
+                        result = self.union(result, derivatives[(current.right.id, symbol)])
+
+            derivatives[key] = result
+            stack.pop()
+        return derivatives[(term.id, symbol)]
+
+    def alphabet_of(self, term):
+        alphabet = set()
+        stack = [term]
+        seen = set()
+        while stack:
+            term = stack.pop()
+            if term.id in seen:
+                continue
+            seen.add(term.id)
+            if term.kind == self.SYMBOL:
+                alphabet.add(term.value)
+            elif term.kind == self.UNION:
+                stack.extend(term.value)
+            else:
+                stack.extend(t for t in (term.left, term.right) if t is not None)
+        return alphabet
+
+    def accepts(self, term, word):
+        """Reconhece a palavra derivando sob demanda, sem construir o AFD."""
+        for symbol in word:
+            term = self.derivative(term, symbol)
+            if term is self.empty:
+                return False
+        return term.nullable
+
+    def compile(self, regex):
+        """Explora as derivadas a partir da regex (texto, Regex ou termo) e devolve o AFD; estados são numerados na ordem de descoberta."""
+        if isinstance(regex, DerivativeTerm):
+            start = regex
+        else:
+            start = self.from_tree((regex if isinstance(regex, Regex) else Regex(regex)).tree)
+        alphabet = self.alphabet_of(start)
+        symbols = sorted(alphabet)
+
+        terms = [start]
+        names = {start.id: "0"}
+        new_transitions = {}
+        i = 0
+        while i < len(terms):
+            term = terms[i]
+            i += 1
+            for symbol in symbols:
+                next_term = self.derivative(term, symbol)
+                if next_term is self.empty:
+                    continue
+                if next_term.id not in names:
+                    names[next_term.id] = str(len(terms))
+                    terms.append(next_term)
+                new_transitions[(names[term.id], symbol)] = names[next_term.id]
+
+        new_states = [names[term.id] for term in terms]
+        new_final_states = frozenset(names[term.id] for term in terms if term.nullable)
+        return DeterministicFiniteAutomaton(new_states, "0", new_final_states, alphabet, new_transitions)
+
+
+class RegexCompileCache:
+    """
+    Cache da compilação regex → AFND → AFD → AFD mínimo, endereçado pela pós-fixa normalizada
+    (Regex.regex_to_post_order_string), então expressões que só diferem em parênteses ou
+    concatenações explícitas compartilham a mesma entrada. Tem uma camada em memória (LRU)
+    e, se directory for informado, uma camada em disco no BinaryAutomatonFormat.
+    Os AFDs devolvidos são compartilhados entre chamadas e não devem ser alterados.
+    """
+    def __init__(self, max_size=256, directory=None):
+        self.max_size = max_size
+        self.directory = directory
+        self.memory = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, postfix):
+        digest = hashlib.sha256(f"{BinaryAutomatonFormat.VERSION}:{postfix}".encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".afd")
+
+    @staticmethod
+    def with_set_states(dfa):
+        """
+        O arquivo guarda os nomes dos estados já formatados por format_set; volta aos frozensets
+        que o construtor devolve, para que acertos em disco e em memória tenham o mesmo tipo.
+        """
+        name = {state: parse_set(state) for state in dfa.states}
+        transitions = {(name[state], symbol): name[target] for (state, symbol), target in dfa.transitions.items()}
+        return DeterministicFiniteAutomaton(set(name.values()), name[dfa.initial_state],
+                                            {name[state] for state in dfa.final_states}, set(dfa.alphabet), transitions)
+
+    def remember(self, postfix, dfa):
+        self.memory[postfix] = dfa
+        if len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def compile(self, expression):
+        """Devolve o AFD mínimo da expressão (texto ou Regex), compilando apenas se não estiver em cache."""
+        regex = expression if isinstance(expression, Regex) else Regex(expression)
+        postfix = regex.regex_to_post_order_string()
+
+        dfa = self.memory.get(postfix)
+        if dfa is not None:
+            self.memory.move_to_end(postfix)
+            return dfa
+
+        path = self.path_for(postfix) if self.directory is not None else None
+        if path is not None and os.path.exists(path):
+            dfa = self.with_set_states(BinaryAutomatonFormat.load(path))
+        else:
+            dfa = RegexProcessor().get_ndfa_from_regex(postfix).determinize().minimize(method="hopcroft")
+            if path is not None:
+                # Grava num arquivo temporário de nome único (entre processos e threads) e renomeia,
+                # para que leitores concorrentes nunca vejam um arquivo parcial
+                with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as file:
+                    temporary = file.name
+                try:
+                    BinaryAutomatonFormat.dump(dfa, temporary)
+                    os.replace(temporary, path)
+                except BaseException:
+                    os.unlink(temporary)  # Não deixa .tmp órfão no diretório do cache
+                    raise
+
+        self.remember(postfix, dfa)
+        return dfa
+
+    def clear(self):
+        """Esvazia apenas a camada em memória."""
+        self.memory.clear()
+
+
+class Lexer:
+    """
+    Analisador léxico gerado a partir de regras (nome do token, regex), dadas em ordem de
+    prioridade. Todas as regex usam a mesma partição de símbolos; o AFND de cada regra é ligado
+    por & a um inicial comum e a construção de subconjuntos rotula cada estado do AFD com a regra
+    de maior prioridade que ele aceita. A minimização (Hopcroft) parte da partição por rótulo, e
+    estados que não levam a nenhum token viram o estado morto, para a varredura parar cedo.
+    """
+    DEAD = -1
+
+    def __init__(self, rules, skip=()):
+        rules = list(rules)
+        if not rules:
+            raise ValueError("O analisador léxico precisa de pelo menos uma regra.")
+        self.names = [name for name, _ in rules]
+        self.skip = set(skip)
+        self.classes = Regex.shared_classes(regex for _, regex in rules)
+
+        # AFND com um inicial novo ligado por & ao inicial de cada regra
+        processor = RegexProcessor()
+        arena = NodeArena()
+        states, alphabet, transitions = set(), set(), {}
+        rule_finals = []
+        initials = set()
+        for name, regex in rules:
+            automaton = processor.get_ndfa_from_regex(Regex(regex, self.classes, arena).regex_to_post_order_string())
+            states |= automaton.states
+            alphabet |= automaton.alphabet
+            transitions.update(automaton.transitions)
+            rule_finals.append(automaton.final_states)
+            initials.add(automaton.initial_state)
+        start = str(processor.max_state_value + 1)
+        states.add(start)
+        transitions[(start, '&')] = initials
+        finals = set().union(*rule_finals)
+        subsets = BitsetSubsetConstruction(NonDeterministicFiniteAutomaton(states, start, finals, alphabet, transitions))
+        rule_masks = [sum(1 << subsets.index[state] for state in group) for group in rule_finals]
+
+        # Construção de subconjuntos com o token (índice da regra) de cada estado
+        self.symbols = sorted(subsets.symbols)
+        masks = [subsets.initial_mask()]
+        number = {masks[0]: 0}
+        dfa_transitions = {}
+        labels = {}
+        for i, mask in enumerate(masks):  # masks cresce durante o laço
+            for rule, rule_mask in enumerate(rule_masks):
+                if mask & rule_mask:
+                    labels[i] = rule
+                    break
+            for symbol in self.symbols:
+                next_mask = subsets.step(mask, symbol)
+                if next_mask:
+                    if next_mask not in number:
+                        number[next_mask] = len(masks)
+                        masks.append(next_mask)
+                    dfa_transitions[(i, symbol)] = number[next_mask]
+        if 0 in labels:
+            raise ValueError(f"A regra '{self.names[labels[0]]}' aceita a palavra vazia.")
+
+        partition = DeterministicFiniteAutomaton.hopcroft_partition(
+            range(len(masks)), set(labels), self.symbols, dfa_transitions, labels)
+        self.build_table(partition, dfa_transitions, labels)
+
+    def build_table(self, partition, transitions, labels):
+        """Numera os blocos (o do inicial é 0), descarta os que não levam a token e monta a tabela plana."""
+        block_of = {}
+        for b, group in enumerate(sorted(partition, key=lambda group: 0 not in group)):
+            for state in group:
+                block_of[state] = b
+        representative = {b: state for state, b in block_of.items()}
+        k = len(self.symbols)
+
+        # Blocos que alcançam algum estado de aceitação (busca para trás)
+        predecessors = [set() for _ in representative]
+        for (state, _), target in transitions.items():
+            predecessors[block_of[target]].add(block_of[state])
+        useful = {block_of[state] for state in labels}
+        queue = deque(useful)
+        while queue:
+            for b in predecessors[queue.popleft()]:
+                if b not in useful:
+                    useful.add(b)
+                    queue.append(b)
+
+        number = {b: i for i, b in enumerate(sorted(useful))}
+        self.width = k + 1  # última coluna: caractere fora do alfabeto
+        self.table = array("i", [self.DEAD]) * (len(number) * self.width)
+        self.accept = array("i", [self.DEAD]) * len(number)
+        for b, i in number.items():
+            state = representative[b]
+            self.accept[i] = labels.get(state, self.DEAD)
+            for c, symbol in enumerate(self.symbols):
+                target = transitions.get((state, symbol))
+                if target is not None and block_of[target] in number:
+                    self.table[i * self.width + c] = number[block_of[target]]
+        self.code_of = SymbolCodeTable({symbol: c for c, symbol in enumerate(self.symbols)}, k, self.classes)
+
+    def __len__(self):
+        return len(self.accept)
+
+    def match(self, codes, start):
+        """Maior prefixo a partir de start reconhecido por alguma regra: devolve (regra, fim) ou (DEAD, start)."""
+        table, accept, width = self.table, self.accept, self.width
+        best, end = self.DEAD, start
+        if not accept:  # nenhuma regra aceita palavra alguma
+            return best, end
+        state = 0
+        i = start
+        while i < len(codes):
+            state = table[state * width + codes[i]]
+            if state < 0:
+                break
+            i += 1
+            if accept[state] >= 0:
+                best, end = accept[state], i
+        return best, end
+
+    def tokens(self, text):
+        """Gera (nome do token, lexema, início) por maior casamento (maximal munch); empates vão para a regra anterior."""
+        code_of = self.code_of
+        codes = [code_of[char] for char in text]
+        position = 0
+        while position < len(codes):
+            rule, end = self.match(codes, position)
+            if rule == self.DEAD:
+                raise ValueError(f"Nenhum token reconhece a entrada na posição {position}.")
+            name = self.names[rule]
+            if name not in self.skip:
+                yield name, text[position:end], position
+            position = end
 
 
 def format_set(s):
@@ -375,6 +2450,27 @@ def format_set(s):
     return str(s)
 
 
+def parse_set(text):
+    """Inverso de format_set: cada "{...}" vira um frozenset (recursivamente) e o resto fica como string."""
+    stack = [[]]
+    token = ""
+    for char in text:
+        if char == "{":
+            stack.append([])
+        elif char in ",}":
+            if token:
+                stack[-1].append(token)
+                token = ""
+            if char == "}":
+                items = stack.pop()
+                stack[-1].append(frozenset(items))
+        else:
+            token += char
+    if token:
+        stack[-1].append(token)
+    return stack[0][0]
+
+
 def main():
     """
     Entrada:
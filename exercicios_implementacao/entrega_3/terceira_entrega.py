@@ -1,6 +1,5 @@
 from sys import argv
 import re
-import copy
 
 class ContextFreeGrammar:
     def __init__(self, N, T, P, S):
@@ -11,6 +10,20 @@ class ContextFreeGrammar:
 
         self.non_terminals_order = self.bfs_non_terminals()
 
+    def shallow_copy(self):
+        """
+        Cópia para os passes de transformação: N, P e as listas de cada não-terminal são novos, mas as
+        produções em si são compartilhadas com a gramática original, já que nenhum passe as altera no
+        lugar (sempre constroem produções novas).
+        """
+        grammar = object.__new__(type(self))
+        grammar.N = set(self.N)
+        grammar.T = set(self.T)
+        grammar.P = {A: list(prods) for A, prods in self.P.items()}
+        grammar.S = self.S
+        grammar.non_terminals_order = list(self.non_terminals_order)
+        return grammar
+
     def __str__(self):
         # Formatar os conjuntos N, T e o símbolo inicial S
         N_str = "{" + ",".join(sorted(self.N)) + "}"
@@ -30,27 +43,64 @@ class ContextFreeGrammar:
 
         return f"{N_str}{T_str}{S_str}{{{P_str}}}"
 
+    @staticmethod
+    def split_production(production_str):
+        """Divide uma produção escrita sem espaços em símbolos (não-terminais com ' contam como um símbolo)."""
+        pattern = r"[A-Z]'+|[A-Z]|[a-z]|\S"
+        return re.findall(pattern, production_str)
+
+    def production_symbols(self, prod):
+        """Símbolos da produção: a lista já separada (entrada com espaços) ou a string única separada."""
+        if len(prod) == 1 and prod[0] not in self.N and prod[0] not in self.T:
+            return self.split_production(prod[0])
+        return prod
+
+    def mark_by_productions(self, marked):
+        """
+        Ponto fixo em tempo linear: marca X ∈ N quando alguma produção X ::= Y1Y2...Yn tem todos os
+        Yi marcados (produção vazia marca na hora). Cada produção guarda quantos símbolos ainda não
+        estão marcados, e um índice símbolo -> produções que o usam propaga cada nova marca por uma
+        lista de trabalho, visitando cada ocorrência uma única vez.
+        """
+        marked = set(marked)
+        heads = []     # heads[k] = não-terminal da produção k
+        missing = []   # missing[k] = ocorrências ainda não marcadas na produção k
+        uses = {}      # símbolo -> produções em que ele aparece (uma entrada por ocorrência)
+        for X in self.N:
+            for prod in self.P.get(X, []):
+                k = len(heads)
+                heads.append(X)
+                count = 0
+                for Y in self.production_symbols(prod):
+                    if Y not in marked:
+                        count += 1
+                        if Y not in uses:
+                            uses[Y] = []
+                        uses[Y].append(k)
+                missing.append(count)
+
+        worklist = []
+        for k, count in enumerate(missing):
+            if count == 0 and heads[k] not in marked:
+                marked.add(heads[k])
+                worklist.append(heads[k])
+        while worklist:
+            Y = worklist.pop()
+            for k in uses.get(Y, []):
+                missing[k] -= 1
+                if missing[k] == 0 and heads[k] not in marked:
+                    marked.add(heads[k])
+                    worklist.append(heads[k])
+        return marked
+
     def identify_non_terminal_epsilon(self):
-        E = set()
-        while True:
-            # Q := {X | X ∈ N e X não está em E e existe uma produção X ::= Y1Y2...Yn com Y1, Y2, ..., Yn ∈ E}
-            Q = set()
-            for X in self.N:
-                if X not in E:
-                    for prod in self.P.get(X, []):
-                        if prod:
-                            if all(Y in E for Y in prod[0]):
-                                Q.add(X)
-                        else:
-                            Q.add(X)
-            # Se Q for vazio, não há novos símbolos para adicionar
-            if not Q:
-                break
-            E.update(Q)
-        return E
-
-
-    def eliminate_non_terminal_epsilon(self):
+        # E = {X | X ::= Y1Y2...Yn com Y1, Y2, ..., Yn ∈ E}, partindo das ε-produções
+        return self.mark_by_productions(set())
+
+    def eliminate_non_terminal_epsilon(self, in_place=False):
+        # Sem in_place, o passe roda sobre uma cópia rasa e a gramática de entrada fica intacta
+        if not in_place:
+            return self.shallow_copy().eliminate_non_terminal_epsilon(in_place=True)
         # Identifica o conjunto E dos ε-não-terminais
         E = self.identify_non_terminal_epsilon()
         # Constrói P' sem as ε-produções
@@ -87,9 +137,12 @@ class ContextFreeGrammar:
         self.S = S_prime
 
 
-        return copy.deepcopy(self)
+        return self
     
-    def eliminate_circular_productions(self):
+    def eliminate_circular_productions(self, in_place=False):
+        # Sem in_place, o passe roda sobre uma cópia rasa e a gramática de entrada fica intacta
+        if not in_place:
+            return self.shallow_copy().eliminate_circular_productions(in_place=True)
         for non_terminal in self.P:
             # Filtra produções removendo aquelas que são do tipo A -> A
             self.P[non_terminal] = [
@@ -97,9 +150,112 @@ class ContextFreeGrammar:
                 if not (len(prod) == 1 and prod[0] == non_terminal)
             ]
         
-        return copy.deepcopy(self)
+        return self
     
-    def eliminate_unit_productions(self):
+    @staticmethod
+    def strongly_connected_components(successors):
+        """
+        Tarjan iterativo sobre os vértices 0..n-1 (successors[v] = vizinhos de v). Devolve
+        (component, count): as componentes são numeradas na ordem em que se fecham, então toda
+        aresta u -> v tem component[v] <= component[u] (ordem topológica reversa).
+        """
+        n = len(successors)
+        index = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        component = [-1] * n
+        stack = []
+        counter = 0
+        count = 0
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, 0)]
+            while work:
+                v, i = work[-1]
+                if i < len(successors[v]):
+                    work[-1] = (v, i + 1)
+                    w = successors[v][i]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, 0))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component[w] = count
+                        if w == v:
+                            break
+                    count += 1
+        return component, count
+
+    def unit_closure(self):
+        """
+        N_A de cada A ∈ N como bitset sobre nodes = sorted(N); devolve (nodes, position, closure).
+        O grafo das produções unitárias é montado uma vez e condensado pelas componentes fortes de
+        Tarjan; o alcance de cada componente é o OR dos alcances das sucessoras, que já estão
+        prontos na ordem em que Tarjan fecha as componentes.
+        """
+        nodes = sorted(self.N)
+        position = {A: i for i, A in enumerate(nodes)}
+        successors = [[] for _ in nodes]
+        for A in nodes:
+            for prod in self.P.get(A, []):
+                if len(prod) == 1 and prod[0] in position:
+                    successors[position[A]].append(position[prod[0]])
+        component, count = self.strongly_connected_components(successors)
+        by_component = [[] for _ in range(count)]
+        reach = [0] * count
+        for v, c in enumerate(component):
+            by_component[c].append(v)
+            reach[c] |= 1 << v
+        for c in range(count):
+            for v in by_component[c]:
+                for w in successors[v]:
+                    if component[w] != c:
+                        reach[c] |= reach[component[w]]
+        return nodes, position, [reach[component[v]] for v in range(len(nodes))]
+
+    def eliminate_unit_productions(self, in_place=False, method="scc"):
+        # Sem in_place, o passe roda sobre uma cópia rasa e a gramática de entrada fica intacta
+        if not in_place:
+            return self.shallow_copy().eliminate_unit_productions(in_place=True, method=method)
+        if method == "scc":
+            nodes, position, closure = self.unit_closure()
+            P_prime = {}
+            for A in self.N:
+                P_prime[A] = []
+                seen = set()  # Produções já copiadas para A, como tuplas
+                bits = closure[position[A]]
+                while bits:
+                    lowest = bits & -bits
+                    bits ^= lowest
+                    for prod in self.P.get(nodes[lowest.bit_length() - 1], []):
+                        if len(prod) == 1 and prod[0] in self.N:
+                            continue
+                        key = tuple(prod)
+                        if key not in seen:
+                            seen.add(key)
+                            P_prime[A].append(prod)
+            self.P = P_prime
+            self.eliminate_unreachable_symbols(in_place=True)
+            return self
+        elif method != "reference":
+            raise ValueError(f"Método de eliminação de produções unitárias desconhecido: {method}")
         P_prime = {}  # Novo conjunto de produções
 
         # Construir NA para cada A ∈ N
@@ -127,28 +283,16 @@ class ContextFreeGrammar:
                             P_prime[A].append(prod)
 
         self.P = P_prime  # Atualiza P com o novo conjunto de produções P'
-        self.eliminate_unreachable_symbols()
-
-        return copy.deepcopy(self)
-
-    def eliminate_unproductive_symbols(self):
-        # SP := T
-        SP = set(self.T)
-        # Repita
-        while True:
-            # Q := {X | X ∈ N e X não está em SP e existe pelo menos uma produção X ::= X1X2...Xn tal que X1, X2, ..., Xn ∈ SP}
-            Q = set()
-            for X in self.N:
-                if X not in SP:
-                    for prod in self.P.get(X, []):
-                        if prod:
-                            if all(symbol in SP for symbol in prod[0]):
-                                Q.add(X)
-                                break
-            # Até Q = ∅
-            if not Q:
-                break
-            SP.update(Q)
+        self.eliminate_unreachable_symbols(in_place=True)
+
+        return self
+
+    def eliminate_unproductive_symbols(self, in_place=False):
+        # Sem in_place, o passe roda sobre uma cópia rasa e a gramática de entrada fica intacta
+        if not in_place:
+            return self.shallow_copy().eliminate_unproductive_symbols(in_place=True)
+        # SP := T ∪ {X | X ::= X1X2...Xn com X1, X2, ..., Xn ∈ SP}
+        SP = self.mark_by_productions(set(self.T))
         # N' := SP ∩ N
         N_prime = SP & self.N
         if self.S in SP:
@@ -157,9 +301,8 @@ class ContextFreeGrammar:
             for A in N_prime:
                 new_prods = []
                 for prod in self.P.get(A, []):
-                    if prod:
-                        if all(symbol in SP for symbol in prod[0]):
-                            new_prods.append(prod)
+                    if all(symbol in SP for symbol in self.production_symbols(prod)):
+                        new_prods.append(prod)
                 if new_prods:
                     P_prime[A] = new_prods
             self.N = N_prime
@@ -169,9 +312,12 @@ class ContextFreeGrammar:
             self.N = set()
             self.P = {}
 
-        return copy.deepcopy(self)
+        return self
 
-    def eliminate_unreachable_symbols(self):
+    def eliminate_unreachable_symbols(self, in_place=False):
+        # Sem in_place, o passe roda sobre uma cópia rasa e a gramática de entrada fica intacta
+        if not in_place:
+            return self.shallow_copy().eliminate_unreachable_symbols(in_place=True)
         # Elimina símbolos não-terminais inalcançáveis, a partir do bfs
         non_terminals = self.bfs_non_terminals()
         for non_teminal in list(self.N):
@@ -179,7 +325,7 @@ class ContextFreeGrammar:
                 self.N.remove(non_teminal)
                 self.P.pop(non_teminal)
 
-        return copy.deepcopy(self)
+        return self
 
     def eliminate_direct_left_recursion(self, non_terminal):
         prods = self.P.get(non_terminal, [])
@@ -187,14 +333,14 @@ class ContextFreeGrammar:
         beta_prods = []   # A ::= β
 
         for prod in prods:
-            if prod:
-                tmp = prod[0]
-                if len(tmp) > 0 and tmp[0] == non_terminal:
-                    # Produção recursiva à esquerda
-                    alpha_prods.append([tmp[1:]])  # Remove A do início da produção
-                else:
-                    # Produção não-recursiva à esquerda
-                    beta_prods.append([tmp])
+            body = self.production_symbols(prod)
+            if body and body[0] == non_terminal:
+                # Produção recursiva à esquerda; A ::= A sozinha é um ciclo que não muda a linguagem
+                if len(body) > 1:
+                    alpha_prods.append(body[1:])  # Remove A do início da produção
+            else:
+                # Produção não-recursiva à esquerda (inclusive A ::= &)
+                beta_prods.append(body)
 
         if alpha_prods:
             # Cria um novo não-terminal para lidar com a recursão à esquerda
@@ -203,32 +349,17 @@ class ContextFreeGrammar:
                 new_non_terminal += "'"
             self.N.add(new_non_terminal)
 
-            # Atualiza produções para A
-            self.P[non_terminal] = []
-            for beta in beta_prods:
-                if beta:
-                    self.P[non_terminal].append([beta[0] + new_non_terminal])
-                else:
-                    # Lida com epsilon em produções beta
-                    self.P[non_terminal].append([new_non_terminal])
-
-            # Produções para A'
-            self.P[new_non_terminal] = []
-            for alpha in alpha_prods:
-                self.P[new_non_terminal].append([alpha[0] + new_non_terminal])
-            # Adiciona epsilon produção para A'
+            # Atualiza produções para A: A ::= β A' (β vazio vira A ::= A')
+            self.P[non_terminal] = [beta + [new_non_terminal] for beta in beta_prods]
+
+            # Produções para A': A' ::= α A' | &
+            self.P[new_non_terminal] = [alpha + [new_non_terminal] for alpha in alpha_prods]
             self.P[new_non_terminal].append([])
         else:
             # Sem recursão direta à esquerda
             self.P[non_terminal] = prods
 
     def bfs_non_terminals(self):
-        # Função auxiliar para dividir uma produção em símbolos
-        def split_production(production_str):
-            pattern = r"[A-Z]'+|[A-Z]|[a-z]|\S"
-            symbols = re.findall(pattern, production_str)
-            return symbols
-
         visited = set()
         queue = [self.S]
         order = []
@@ -241,7 +372,7 @@ class ContextFreeGrammar:
                 for prod in self.P.get(current, []):
                     if prod:
                         prod_str = ''.join(prod)
-                        symbols = split_production(prod_str)
+                        symbols = self.split_production(prod_str)
                         for symbol in symbols:
                             
                             if symbol in self.N and symbol not in visited:
@@ -249,7 +380,150 @@ class ContextFreeGrammar:
 
         return order
         
-    def eliminate_left_recursion(self):
+    @staticmethod
+    def productions_size(bodies):
+        """Tamanho de uma lista de produções (listas de símbolos): símbolos do corpo mais um por produção."""
+        return sum(len(body) + 1 for body in bodies)
+
+    def grammar_size(self):
+        """|G| = soma, sobre todas as produções, do número de símbolos do corpo mais um."""
+        return sum(self.productions_size(self.production_symbols(prod) for prod in prods) for prods in self.P.values())
+
+    def unique_bodies(self, prods):
+        """Produções como listas de símbolos, sem repetições (comparadas como tuplas) e na ordem original."""
+        seen = set()
+        bodies = []
+        for prod in prods:
+            body = self.production_symbols(prod)
+            if tuple(body) not in seen:
+                seen.add(tuple(body))
+                bodies.append(body)
+        return bodies
+
+    def fresh_non_terminal(self, base):
+        new_non_terminal = base + "'"
+        while new_non_terminal in self.N or new_non_terminal in self.T:
+            new_non_terminal += "'"
+        self.N.add(new_non_terminal)
+        return new_non_terminal
+
+    def left_factor(self, head, bodies, created):
+        """
+        Fatoração à esquerda das produções de head: cada grupo com o mesmo primeiro símbolo vira
+        prefixo comum + novo não-terminal, fatorado recursivamente. Devolve as novas produções de
+        head; as dos não-terminais criados já ficam em P e seus nomes são acrescentados a created.
+        """
+        groups = {}
+        for body in bodies:
+            key = body[0] if body else None
+            if key not in groups:
+                groups[key] = []
+            groups[key].append(body)
+        factored = []
+        for key, group in groups.items():
+            if key is None or len(group) == 1:
+                factored.extend(group)
+                continue
+            length = 1
+            while all(len(body) > length and body[length] == group[0][length] for body in group):
+                length += 1
+            new_non_terminal = self.fresh_non_terminal(head)
+            created.append(new_non_terminal)
+            self.P[new_non_terminal] = self.left_factor(new_non_terminal, [body[length:] for body in group], created)
+            factored.append(group[0][:length] + [new_non_terminal])
+        return factored
+
+    def left_recursive_components(self):
+        """Componentes fortes do grafo de cantos à esquerda (A -> B se A ::= B...) que têm recursão à esquerda."""
+        nodes = sorted(self.N)
+        position = {A: i for i, A in enumerate(nodes)}
+        successors = [[] for _ in nodes]
+        self_loop = [False] * len(nodes)
+        for A in nodes:
+            for prod in self.P.get(A, []):
+                body = self.production_symbols(prod)
+                if body and body[0] in position:
+                    successors[position[A]].append(position[body[0]])
+                    if body[0] == A:
+                        self_loop[position[A]] = True
+        component, count = self.strongly_connected_components(successors)
+        members = [[] for _ in range(count)]
+        for v, c in enumerate(component):
+            members[c].append(v)
+        return [[nodes[v] for v in group] for group in members if len(group) > 1 or self_loop[group[0]]]
+
+    def eliminate_left_recursive_components(self, max_size=None, report=None):
+        """
+        Algoritmo de Paull restrito às componentes fortes com recursão à esquerda; o resto de P
+        fica como está. Em cada componente, o próximo Ai é o de menor crescimento estimado (quantas
+        produções a substituição dos Aj já tratados acrescenta, com desempate pelo nome), as
+        produções de Ai são fatoradas à esquerda antes da recursão direta e o tamanho |G| é
+        acompanhado a cada passo: acima de max_size, ValueError. Se report for um dicionário,
+        recebe size_before, size, orders e new_non_terminals. Como no algoritmo do livro, supõe
+        gramática sem ciclos e sem ε-produções fora do símbolo inicial.
+        """
+        size_before = self.grammar_size()
+        size = size_before
+        orders = []
+        new_non_terminals = []
+        for component in self.left_recursive_components():
+            bodies = {A: self.unique_bodies(self.P.get(A, [])) for A in component}
+            corners = {A: {} for A in component}  # corners[A][B] = produções de A que começam por B
+            for A in component:
+                for body in bodies[A]:
+                    if body and body[0] in corners and body[0] != A:
+                        corners[A][body[0]] = corners[A].get(body[0], 0) + 1
+            cost = {A: 0 for A in component}
+            remaining = set(component)
+            order = []
+            while remaining:
+                Ai = min(remaining, key=lambda A: (cost[A], A))
+                remaining.remove(Ai)
+                current = bodies[Ai]
+                # Substitui Ai ::= Aj α por Ai ::= β α (Aj ::= β), na ordem em que os Aj foram tratados
+                for Aj in order:
+                    if any(body and body[0] == Aj for body in current):
+                        expanded = []
+                        for body in current:
+                            if body and body[0] == Aj:
+                                expanded.extend(beta + body[1:] for beta in bodies[Aj])
+                            else:
+                                expanded.append(body)
+                        current = expanded
+                current = [body for body in self.unique_bodies(current) if body != [Ai]]  # Ai ::= Ai é um ciclo inútil
+                created = []
+                current = self.left_factor(Ai, current, created)
+                alphas = [body[1:] for body in current if body and body[0] == Ai]
+                if alphas:
+                    # Recursão direta: Ai ::= β Ai' e Ai' ::= α Ai' | &
+                    new_non_terminal = self.fresh_non_terminal(Ai)
+                    created.append(new_non_terminal)
+                    current = [body + [new_non_terminal] for body in current if not body or body[0] != Ai]
+                    self.P[new_non_terminal] = [alpha + [new_non_terminal] for alpha in alphas] + [[]]
+                size += (self.productions_size(current) + sum(self.productions_size(self.P[A]) for A in created)
+                         - self.productions_size(self.production_symbols(prod) for prod in self.P.get(Ai, [])))
+                bodies[Ai] = current
+                self.P[Ai] = current
+                order.append(Ai)
+                new_non_terminals.extend(created)
+                if max_size is not None and size > max_size:
+                    raise ValueError(f"Eliminação de recursão à esquerda excedeu o tamanho máximo: {size} > {max_size}")
+                for A in remaining:
+                    if Ai in corners[A]:
+                        cost[A] += corners[A][Ai] * (len(current) - 1)
+            orders.append(order)
+        if report is not None:
+            report.update(size_before=size_before, size=size, orders=orders, new_non_terminals=new_non_terminals)
+        return self
+
+    def eliminate_left_recursion(self, in_place=False, method="scc", max_size=None, report=None):
+        # Sem in_place, o passe roda sobre uma cópia rasa e a gramática de entrada fica intacta
+        if not in_place:
+            return self.shallow_copy().eliminate_left_recursion(in_place=True, method=method, max_size=max_size, report=report)
+        if method == "scc":
+            return self.eliminate_left_recursive_components(max_size, report)
+        elif method != "reference":
+            raise ValueError(f"Método de eliminação de recursão à esquerda desconhecido: {method}")
         non_terminals = self.non_terminals_order
         #non_terminals = self.bfs_non_terminals()
         non_terminals = list(self.N)
@@ -257,25 +531,24 @@ class ContextFreeGrammar:
             Ai = non_terminals[i]
             for j in range(i):
                 Aj = non_terminals[j]
+                kept_prods = []
                 new_prods = []
-                # Substitui Ai ::= Aj α por Ai ::= β α, onde Aj ::= β
-                for prod in self.P.get(Ai, []):
-                    if prod:
-                        tmp = prod[0]
-                        if len(tmp) > 0 and tmp[0] == Aj:
-                            alpha = prod[0][1:]  # α
-                            self.P[Ai].remove([tmp])  # Remove Ai ::= Aj α
-                            for beta in self.P.get(Aj, []):
-                                if beta:
-                                    beta_ = beta[0]
-                                    new_prod = beta_ + alpha  # β α
-                                    new_prods.append([new_prod])
-                self.P[Ai].extend(new_prods)
+                # Substitui Ai ::= Aj α por Ai ::= β α, onde Aj ::= β; percorre uma cópia e monta a lista nova
+                for prod in list(self.P.get(Ai, [])):
+                    body = self.production_symbols(prod)
+                    if body and body[0] == Aj:
+                        alpha = body[1:]  # α
+                        for beta in self.P.get(Aj, []):
+                            new_prods.append(self.production_symbols(beta) + alpha)  # β α
+                    else:
+                        kept_prods.append(prod)
+                if Ai in self.P:
+                    self.P[Ai] = kept_prods + new_prods
             # Elimina recursões diretas em Ai
             self.eliminate_direct_left_recursion(Ai)
         #self.eliminate_unreachable_symbols()
         
-        return copy.deepcopy(self)
+        return self
 
 def parse_input(entrada):
     # Expressão regular para encontrar os quatro conjuntos no formato "{...}"
@@ -299,8 +572,10 @@ def main():
     vpl_input = argv[1] # **Não remover essa linha**, ela é responsável por receber a string de entrada do VPL
     N,T,P,S = parse_input(vpl_input)
     cfg = ContextFreeGrammar(N,T,P,S)
-    result1 = cfg.eliminate_non_terminal_epsilon().eliminate_circular_productions().eliminate_unit_productions()
-    result2 = cfg.eliminate_left_recursion()
+    epsilon_free = cfg.eliminate_non_terminal_epsilon()
+    result1 = epsilon_free.eliminate_circular_productions().eliminate_unit_productions()
+    # Recursão à esquerda sobre a gramática já sem ε; o VPL espera a saída do algoritmo do livro
+    result2 = epsilon_free.eliminate_left_recursion(method="reference")
     print(f"<<{result1}><{result2}>>")
 
 if __name__ == '__main__':
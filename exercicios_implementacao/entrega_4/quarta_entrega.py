@@ -38,111 +38,199 @@ class IOHandler:
         output = '; '.join(first_output + follow_output)
         return output
 
+class Production:
+    """Produção com símbolos internados: head é o id do não-terminal e body a tupla de ids (vazia para &)."""
+    __slots__ = ("head", "body", "index")
+
+    def __init__(self, head, body, index):
+        self.head = head
+        self.body = body
+        self.index = index
+
+    def __repr__(self):
+        return f"Production({self.head}, {self.body})"
+
+
+class GrammarCore:
+    """
+    Núcleo de gramática compartilhado: cada símbolo é internado como inteiro (ids), cada produção é
+    uma tupla imutável de ids em um registro Production, e by_head indexa as produções pelo
+    não-terminal. O conversor aceita o formato de produção das entregas 4 e 5 (lado direito como
+    uma string só), então os passes de ponto fixo trabalham sobre inteiros sem voltar a separar strings.
+    """
+    EPSILON = '&'
+    END = '$'
+
+    def __init__(self, nonterminals, terminals, start):
+        self.names = []          # id -> nome
+        self.ids = {}            # nome -> id
+        self.is_nonterminal = []
+        for name in nonterminals:
+            self.intern(name, True)
+        for name in terminals:
+            self.intern(name, False)
+        self.start = self.intern(start, True)
+        self.end = self.intern(self.END)
+        self.productions = []
+        self.by_head = {}        # id do não-terminal -> lista de Production
+        self.seen = set()        # (head, body) já adicionados
+
+    def intern(self, name, nonterminal=False):
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = len(self.names)
+            self.ids[name] = symbol
+            self.names.append(name)
+            self.is_nonterminal.append(nonterminal)
+        elif nonterminal:
+            self.is_nonterminal[symbol] = True
+        return symbol
+
+    def add_production(self, head, body):
+        """Adiciona head ::= body (nomes); produções repetidas são ignoradas. Devolve o Production."""
+        head = self.intern(head, True)
+        body = tuple(self.intern(name) for name in body if name != self.EPSILON)
+        if (head, body) in self.seen:
+            return None
+        self.seen.add((head, body))
+        production = Production(head, body, len(self.productions))
+        self.productions.append(production)
+        if head not in self.by_head:
+            self.by_head[head] = []
+        self.by_head[head].append(production)
+        return production
+
+    def split(self, text):
+        """Separa uma string em símbolos conhecidos pelo maior casamento; caractere desconhecido vira símbolo próprio."""
+        longest = max((len(name) for name in self.names), default=1)
+        symbols = []
+        i = 0
+        while i < len(text):
+            if text[i].isspace():
+                i += 1
+                continue
+            for size in range(min(longest, len(text) - i), 0, -1):
+                if text[i:i + size] in self.ids:
+                    break
+            else:
+                size = 1
+            symbols.append(text[i:i + size])
+            i += size
+        return symbols
+
+    @classmethod
+    def from_string_productions(cls, N, T, P, S):
+        """Formato das entregas 4 e 5: cada produção é [lado direito inteiro como string] ou ['&']."""
+        core = cls(N, T, S)
+        for head, productions in P.items():
+            for prod in productions:
+                core.add_production(head, core.split(prod[0]) if prod else [])
+        return core
+
+    def body_names(self, production):
+        return [self.names[symbol] for symbol in production.body]
+
+    def nullable(self):
+        """Lista de booleanos por id: o símbolo deriva &. Contador por produção e lista de trabalho."""
+        nullable = [False] * len(self.names)
+        missing = [len(production.body) for production in self.productions]
+        uses = [[] for _ in self.names]
+        for production in self.productions:
+            for symbol in production.body:
+                uses[symbol].append(production.index)
+        worklist = []
+        for production in self.productions:
+            if not production.body and not nullable[production.head]:
+                nullable[production.head] = True
+                worklist.append(production.head)
+        while worklist:
+            symbol = worklist.pop()
+            for k in uses[symbol]:
+                missing[k] -= 1
+                head = self.productions[k].head
+                if missing[k] == 0 and not nullable[head]:
+                    nullable[head] = True
+                    worklist.append(head)
+        return nullable
+
+    def first_sets(self):
+        """FIRST de cada id, como conjuntos de ids de terminais; & entra em FIRST(X) se X é anulável."""
+        nullable = self.nullable()
+        first = [set() if self.is_nonterminal[symbol] else {symbol} for symbol in range(len(self.names))]
+        changed = True
+        while changed:
+            changed = False
+            for production in self.productions:
+                target = first[production.head]
+                before = len(target)
+                for symbol in production.body:
+                    target |= first[symbol]
+                    if not nullable[symbol]:
+                        break
+                if len(target) != before:
+                    changed = True
+        return first, nullable
+
+    def first_of(self, body, first, nullable):
+        """FIRST de uma sequência de ids e se ela é anulável."""
+        result = set()
+        for symbol in body:
+            result |= first[symbol]
+            if not nullable[symbol]:
+                return result, False
+        return result, True
+
+    def follow_sets(self, first=None, nullable=None):
+        """FOLLOW de cada não-terminal, como conjuntos de ids ('$' é o id end)."""
+        if first is None:
+            first, nullable = self.first_sets()
+        follow = [set() for _ in self.names]
+        follow[self.start].add(self.end)
+        changed = True
+        while changed:
+            changed = False
+            for production in self.productions:
+                body = production.body
+                trailer = set(follow[production.head])  # FOLLOW da cabeça enquanto o sufixo for anulável
+                for symbol in reversed(body):
+                    if self.is_nonterminal[symbol]:
+                        before = len(follow[symbol])
+                        follow[symbol] |= trailer
+                        if len(follow[symbol]) != before:
+                            changed = True
+                        if nullable[symbol]:
+                            trailer = trailer | first[symbol]
+                        else:
+                            trailer = set(first[symbol])
+                    else:
+                        trailer = {symbol}
+        return follow
+
+    def names_of(self, symbols):
+        return {self.names[symbol] for symbol in symbols}
+
+
 class ContextFreeGrammar:
     def __init__(self, N, T, P, S):
         self.N = N  # Conjunto de não-terminais
         self.T = T  # Conjunto de terminais
         self.P = P  # Produções
         self.S = S  # Símbolo inicial
+        self.core = GrammarCore.from_string_productions(N, T, P, S)  # Símbolos internados e produções em tuplas
 
     def compute_first(self):
-        first = {symbol: set() for symbol in self.N}  # Inicializa FIRST para cada não-terminal
-        for terminal in self.T:
-            first[terminal] = {terminal}  # FIRST de um terminal é ele mesmo
-        
-        changed = True
-        while changed:
-            changed = False
-            for X in self.N:
-                for production_ in self.P[X]:
-                    if production_:
-                        production = production_[0]
-                        if production == '&':  # Regra para epsilon
-                            if '&' not in first[X]:
-                                first[X].add('&')
-                                changed = True
-                        else:
-                            symbol_ = ""
-                            for symbol in production:
-                                symbol_ += symbol
-                                if symbol_ in self.T or symbol_ in self.N:
-                                    before = len(first[X])
-                                    first[X].update(first[symbol_] - {'&'})  # Adiciona FIRST do símbolo
-                                    if '&' not in first[symbol_]:
-                                        break  # Interrompe se não há epsilon
-                                    if symbol_ == production[-1]:
-                                        first[X].add('&')  # Adiciona epsilon se necessário
-                                    after = len(first[X])
-                                    if after > before:
-                                        changed = True
-                                    symbol_ = ""
+        """FIRST de cada símbolo (terminais inclusive), com '&' nos anuláveis; calculado sobre o núcleo de ids."""
+        first_ids, nullable = self.core.first_sets()
+        first = {}
+        for symbol in list(self.N) + list(self.T):
+            i = self.core.ids[symbol]
+            first[symbol] = self.core.names_of(first_ids[i]) | ({'&'} if nullable[i] else set())
         return first
 
     def compute_follow(self):
-        follow = {A: set() for A in self.N}  # Inicializa FOLLOW para cada não-terminal
-        follow[self.S].add('$')  # Adiciona $ ao FOLLOW do símbolo inicial
-        first = self.compute_first()  # Calcula FIRST para auxiliar
-
-        changed = True
-        while changed:
-            changed = False
-            for A in self.N:
-                for production_ in self.P[A]:
-                    if production_:
-                        production = production_[0]
-                        for i, B in enumerate(production):
-                            if B in self.N:
-                                beta = production[i+1:]
-                                if beta:
-                                    # Se beta não é vazio
-                                    first_beta = set()
-                                    symbol_ = ""
-                                    for symbol in beta:
-                                        symbol_ += symbol
-                                        if symbol_ in self.T or symbol_ in self.N:
-                                            first_beta.update(first[symbol_] - {'&'})
-                                            if '&' not in first[symbol_]:
-                                                break
-                                            symbol_ = ""
-                                    else:
-                                        last_beta = ""
-                                        for i in range(1, len(beta) + 1):
-                                            last_beta = beta[-i:]
-                                            if last_beta in first.keys():
-                                                print(last_beta, self.T, self.N)
-                                                break
-                                        if '&' in first[last_beta]:
-                                            first_beta.add('&')
-                                    before = len(follow[B])
-                                    follow[B].update(first_beta - {'&'})  # Atualiza FOLLOW(B)
-                                    after = len(follow[B])
-                                    if after > before:
-                                        changed = True
-                                    # Se FIRST(beta) contém epsilon
-                                    all_nullable = True
-                                    symbol_ = ""  
-                                    for symbol in beta:
-                                        symbol_ += symbol
-                                        if symbol_ in first.keys():
-                                            if '&' not in first[symbol_]:
-                                                all_nullable = False  
-                                                break
-                                            symbol_ = "" 
-                                    # Se FIRST(beta) contém epsilon
-                                    if all_nullable:
-                                        before = len(follow[B])
-                                        follow[B].update(follow[A])  
-                                        after = len(follow[B])
-                                        if after > before:
-                                            changed = True
-                                else:
-                                    # Beta é vazio
-                                    before = len(follow[B])
-                                    follow[B].update(follow[A])  # Adiciona FOLLOW(A) a FOLLOW(B)
-                                    after = len(follow[B])
-                                    if after > before:
-                                        changed = True
-        return follow
+        """FOLLOW de cada não-terminal, com '$' no do símbolo inicial; calculado sobre o núcleo de ids."""
+        follow_ids = self.core.follow_sets()
+        return {A: self.core.names_of(follow_ids[self.core.ids[A]]) for A in self.N}
 
 def main():
     vpl_input = sys.argv[1]  # **Não remover esta linha**, ela recebe a string de entrada do VPL
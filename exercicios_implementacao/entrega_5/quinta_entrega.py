@@ -42,41 +42,241 @@ class IOHandler:
         output = f"<<{N_str};{S};{T_str};{''.join(table_entries)}><{'sim' if is_ll1 else 'não'}>>"
         return output
 
+class Production:
+    """Produção com símbolos internados: head é o id do não-terminal e body a tupla de ids (vazia para &)."""
+    __slots__ = ("head", "body", "index")
+
+    def __init__(self, head, body, index):
+        self.head = head
+        self.body = body
+        self.index = index
+
+    def __repr__(self):
+        return f"Production({self.head}, {self.body})"
+
+
+class GrammarCore:
+    """
+    Núcleo de gramática compartilhado: cada símbolo é internado como inteiro (ids), cada produção é
+    uma tupla imutável de ids em um registro Production, e by_head indexa as produções pelo
+    não-terminal. O conversor aceita o formato de produção das entregas 4 e 5 (lado direito como
+    uma string só), então os passes de ponto fixo trabalham sobre inteiros sem voltar a separar strings.
+    """
+    EPSILON = '&'
+    END = '$'
+
+    def __init__(self, nonterminals, terminals, start):
+        self.names = []          # id -> nome
+        self.ids = {}            # nome -> id
+        self.is_nonterminal = []
+        for name in nonterminals:
+            self.intern(name, True)
+        for name in terminals:
+            self.intern(name, False)
+        self.start = self.intern(start, True)
+        self.end = self.intern(self.END)
+        self.productions = []
+        self.by_head = {}        # id do não-terminal -> lista de Production
+        self.seen = set()        # (head, body) já adicionados
+
+    def intern(self, name, nonterminal=False):
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = len(self.names)
+            self.ids[name] = symbol
+            self.names.append(name)
+            self.is_nonterminal.append(nonterminal)
+        elif nonterminal:
+            self.is_nonterminal[symbol] = True
+        return symbol
+
+    def add_production(self, head, body):
+        """Adiciona head ::= body (nomes); produções repetidas são ignoradas. Devolve o Production."""
+        head = self.intern(head, True)
+        body = tuple(self.intern(name) for name in body if name != self.EPSILON)
+        if (head, body) in self.seen:
+            return None
+        self.seen.add((head, body))
+        production = Production(head, body, len(self.productions))
+        self.productions.append(production)
+        if head not in self.by_head:
+            self.by_head[head] = []
+        self.by_head[head].append(production)
+        return production
+
+    def split(self, text):
+        """Separa uma string em símbolos conhecidos pelo maior casamento; caractere desconhecido vira símbolo próprio."""
+        longest = max((len(name) for name in self.names), default=1)
+        symbols = []
+        i = 0
+        while i < len(text):
+            if text[i].isspace():
+                i += 1
+                continue
+            for size in range(min(longest, len(text) - i), 0, -1):
+                if text[i:i + size] in self.ids:
+                    break
+            else:
+                size = 1
+            symbols.append(text[i:i + size])
+            i += size
+        return symbols
+
+    @classmethod
+    def from_string_productions(cls, N, T, P, S):
+        """Formato das entregas 4 e 5: cada produção é [lado direito inteiro como string] ou ['&']."""
+        core = cls(N, T, S)
+        for head, productions in P.items():
+            for prod in productions:
+                core.add_production(head, core.split(prod[0]) if prod else [])
+        return core
+
+    def body_names(self, production):
+        return [self.names[symbol] for symbol in production.body]
+
+    def nullable(self):
+        """Lista de booleanos por id: o símbolo deriva &. Contador por produção e lista de trabalho."""
+        nullable = [False] * len(self.names)
+        missing = [len(production.body) for production in self.productions]
+        uses = [[] for _ in self.names]
+        for production in self.productions:
+            for symbol in production.body:
+                uses[symbol].append(production.index)
+        worklist = []
+        for production in self.productions:
+            if not production.body and not nullable[production.head]:
+                nullable[production.head] = True
+                worklist.append(production.head)
+        while worklist:
+            symbol = worklist.pop()
+            for k in uses[symbol]:
+                missing[k] -= 1
+                head = self.productions[k].head
+                if missing[k] == 0 and not nullable[head]:
+                    nullable[head] = True
+                    worklist.append(head)
+        return nullable
+
+    def first_sets(self):
+        """FIRST de cada id, como conjuntos de ids de terminais; & entra em FIRST(X) se X é anulável."""
+        nullable = self.nullable()
+        first = [set() if self.is_nonterminal[symbol] else {symbol} for symbol in range(len(self.names))]
+        changed = True
+        while changed:
+            changed = False
+            for production in self.productions:
+                target = first[production.head]
+                before = len(target)
+                for symbol in production.body:
+                    target |= first[symbol]
+                    if not nullable[symbol]:
+                        break
+                if len(target) != before:
+                    changed = True
+        return first, nullable
+
+    def first_of(self, body, first, nullable):
+        """FIRST de uma sequência de ids e se ela é anulável."""
+        result = set()
+        for symbol in body:
+            result |= first[symbol]
+            if not nullable[symbol]:
+                return result, False
+        return result, True
+
+    def follow_sets(self, first=None, nullable=None):
+        """FOLLOW de cada não-terminal, como conjuntos de ids ('$' é o id end)."""
+        if first is None:
+            first, nullable = self.first_sets()
+        follow = [set() for _ in self.names]
+        follow[self.start].add(self.end)
+        changed = True
+        while changed:
+            changed = False
+            for production in self.productions:
+                body = production.body
+                trailer = set(follow[production.head])  # FOLLOW da cabeça enquanto o sufixo for anulável
+                for symbol in reversed(body):
+                    if self.is_nonterminal[symbol]:
+                        before = len(follow[symbol])
+                        follow[symbol] |= trailer
+                        if len(follow[symbol]) != before:
+                            changed = True
+                        if nullable[symbol]:
+                            trailer = trailer | first[symbol]
+                        else:
+                            trailer = set(first[symbol])
+                    else:
+                        trailer = {symbol}
+        return follow
+
+    def names_of(self, symbols):
+        return {self.names[symbol] for symbol in symbols}
+
+
 class ContextFreeGrammar:
     def __init__(self, N, T, P, S):
         self.N = N  # Conjunto de não-terminais
         self.T = T  # Conjunto de terminais
         self.P = P  # Produções
         self.S = S  # Símbolo inicial
+        self.core = GrammarCore.from_string_productions(N, T, P, S)  # Símbolos internados e produções em tuplas
 
     def is_LL1(self):
         no_left_recursion = self.check_left_recursion()
         is_left_factored = self.check_left_factoring()
         first_follow_disjoint = self.check_first_follow_disjoint()
-        return no_left_recursion and is_left_factored and first_follow_disjoint
+        no_table_conflicts = self.check_parsing_table_conflicts()
+        return no_left_recursion and is_left_factored and first_follow_disjoint and no_table_conflicts
 
     def check_left_recursion(self):
-        for A in self.N:
-            for production_ in self.P.get(A, []):
-                if production_:
-                    production = production_[0]
-                    if production and production[0] == A:
+        """
+        Recursão à esquerda direta ou indireta: ciclo no grafo de cantos à esquerda, com aresta
+        A -> B quando A ::= αBβ e α é anulável. Busca em profundidade iterativa sobre o núcleo.
+        """
+        core = self.core
+        nullable = core.nullable()
+        corners = {}
+        for production in core.productions:
+            for symbol in production.body:
+                if core.is_nonterminal[symbol]:
+                    if production.head not in corners:
+                        corners[production.head] = set()
+                    corners[production.head].add(symbol)
+                if not nullable[symbol]:
+                    break
+        state = {}  # 1 = na pilha da busca, 2 = concluído
+        for root in corners:
+            if root in state:
+                continue
+            state[root] = 1
+            stack = [(root, iter(corners[root]))]
+            while stack:
+                node, successors = stack[-1]
+                for successor in successors:
+                    if state.get(successor) == 1:
                         return False  # Recursão à esquerda encontrada
+                    if successor not in state:
+                        state[successor] = 1
+                        stack.append((successor, iter(corners.get(successor, ()))))
+                        break
+                else:
+                    state[node] = 2
+                    stack.pop()
         return True
 
     def check_left_factoring(self):
-        for A in self.N:
-            prefixes = {}
-            for production_ in self.P.get(A, []):
-                if production_:
-                    first_symbol = ""
-                    for symbol in production_[0]:
-                        first_symbol += symbol
-                        if symbol in self.T or symbol in self.N:
-                            break
-                    if first_symbol in prefixes:
-                        return False  # Necessita fatoração
-                    prefixes[first_symbol] = True
+        # Produções repetidas também pedem fatoração; o núcleo as descarta, então a checagem é feita em P
+        for productions in self.P.values():
+            if len({tuple(production) for production in productions}) != len(productions):
+                return False
+        for productions in self.core.by_head.values():
+            prefixes = set()
+            for production in productions:
+                first_symbol = production.body[0] if production.body else None
+                if first_symbol in prefixes:
+                    return False  # Necessita fatoração
+                prefixes.add(first_symbol)
         return True
 
     def check_first_follow_disjoint(self):
@@ -88,145 +288,57 @@ class ContextFreeGrammar:
                     return False  # First(A) e Follow(A) não são disjuntos
         return True
 
+    def check_parsing_table_conflicts(self):
+        # Conflitos FIRST/FIRST (e FIRST/FOLLOW): duas produções disputando a mesma célula (A, t)
+        conflicts = []
+        self.compute_parsing_table(conflicts)
+        return not conflicts
+
     def compute_first(self):
-        first = {symbol: set() for symbol in self.N}  # Inicializa FIRST para cada não-terminal
-        for terminal in self.T:
-            first[terminal] = {terminal}  # FIRST de um terminal é ele mesmo
-        
-        changed = True
-        while changed:
-            changed = False
-            for X in self.N:
-                for production_ in self.P[X]:
-                    if production_:
-                        production = production_[0]
-                        if production == '&':  # Regra para epsilon
-                            if '&' not in first[X]:
-                                first[X].add('&')
-                                changed = True
-                        else:
-                            symbol_ = ""
-                            for symbol in production:
-                                symbol_ += symbol
-                                if symbol_ in self.T or symbol_ in self.N:
-                                    before = len(first[X])
-                                    first[X].update(first[symbol_] - {'&'})  # Adiciona FIRST do símbolo
-                                    if '&' not in first[symbol_]:
-                                        break  # Interrompe se não há epsilon
-                                    if symbol_ == production[-1]:
-                                        first[X].add('&')  # Adiciona epsilon se necessário
-                                    after = len(first[X])
-                                    if after > before:
-                                        changed = True
-                                    symbol_ = ""
+        """FIRST de cada símbolo (terminais inclusive), com '&' nos anuláveis; calculado sobre o núcleo de ids."""
+        first_ids, nullable = self.core.first_sets()
+        first = {}
+        for symbol in list(self.N) + list(self.T):
+            i = self.core.ids[symbol]
+            first[symbol] = self.core.names_of(first_ids[i]) | ({'&'} if nullable[i] else set())
         return first
 
     def compute_follow(self):
-        follow = {A: set() for A in self.N}  # Inicializa FOLLOW para cada não-terminal
-        follow[self.S].add('$')  # Adiciona $ ao FOLLOW do símbolo inicial
-        first = self.compute_first()  # Calcula FIRST para auxiliar
-
-        changed = True
-        while changed:
-            changed = False
-            for A in self.N:
-                for production_ in self.P[A]:
-                    if production_:
-                        production = production_[0]
-                        for i, B in enumerate(production):
-                            if B in self.N:
-                                beta = production[i+1:]
-                                if beta:
-                                    # Se beta não é vazio
-                                    first_beta = set()
-                                    symbol_ = ""
-                                    for symbol in beta:
-                                        symbol_ += symbol
-                                        if symbol_ in self.T or symbol_ in self.N:
-                                            first_beta.update(first[symbol_] - {'&'})
-                                            if '&' not in first[symbol_]:
-                                                break
-                                            symbol_ = ""
-                                    else:
-                                        last_beta = ""
-                                        for i in range(1, len(beta) + 1):
-                                            last_beta = beta[-i:]
-                                            if last_beta in first.keys():
-                                                break
-                                        if '&' in first[last_beta]:
-                                            first_beta.add('&')
-                                    before = len(follow[B])
-                                    follow[B].update(first_beta - {'&'})  # Atualiza FOLLOW(B)
-                                    after = len(follow[B])
-                                    if after > before:
-                                        changed = True
-                                    # Se FIRST(beta) contém epsilon
-                                    all_nullable = True
-                                    symbol_ = ""  
-                                    for symbol in beta:
-                                        symbol_ += symbol
-                                        if symbol_ in first.keys():
-                                            if '&' not in first[symbol_]:
-                                                all_nullable = False  
-                                                break
-                                            symbol_ = "" 
-                                    # Se FIRST(beta) contém epsilon
-                                    if all_nullable:
-                                        before = len(follow[B])
-                                        follow[B].update(follow[A])  
-                                        after = len(follow[B])
-                                        if after > before:
-                                            changed = True
-                                else:
-                                    # Beta é vazio
-                                    before = len(follow[B])
-                                    follow[B].update(follow[A])  # Adiciona FOLLOW(A) a FOLLOW(B)
-                                    after = len(follow[B])
-                                    if after > before:
-                                        changed = True
-        return follow
+        """FOLLOW de cada não-terminal, com '$' no do símbolo inicial; calculado sobre o núcleo de ids."""
+        follow_ids = self.core.follow_sets()
+        return {A: self.core.names_of(follow_ids[self.core.ids[A]]) for A in self.N}
 
-    def compute_parsing_table(self):
+    def compute_parsing_table(self, conflicts=None):
+        """Tabela LL(1); se conflicts for uma lista, recebe as células (A, t) sobrescritas por outra produção."""
         parsing_table = {}
-        first = self.compute_first()
-        follow = self.compute_follow()
+        core = self.core
+        first, nullable = core.first_sets()
+        follow = core.follow_sets(first, nullable)
         for A in self.N:
-            for production in self.P[A]:
-                if production == ['&']:
-                    for b in follow[A]:
-                        key = (A, b)
-                        parsing_table[key] = production
-                else:
-                    first_set = set()
-                    production_ = production[0]
-                    if production_:
-                        symbol_ = ""
-                        for symbol in production_:
-                            symbol_ += symbol
-                            if symbol_ in self.T or symbol_ in self.N:
-                                first_set.update(first[symbol_])
-                                if '&' not in first[symbol_]:
-                                    break
-                                symbol_ = ""
-                        else:
-                            first_set.add('&')
-                        for terminal in first_set - {'&'}:
-                            key = (A, terminal)
-                            parsing_table[key] = production_
-                        if '&' in first_set:
-                            for b in follow[A]:
-                                key = (A, b)
-                                parsing_table[key] = production_
+            for production in core.by_head.get(core.ids[A], []):
+                # Mesmo valor de antes na tabela: a string do lado direito, ou ['&']
+                value = ''.join(core.body_names(production)) if production.body else ['&']
+                first_set, body_nullable = core.first_of(production.body, first, nullable)
+                cells = [(A, core.names[terminal]) for terminal in first_set]
+                if body_nullable:
+                    cells += [(A, core.names[b]) for b in follow[production.head]]
+                for key in cells:
+                    if conflicts is not None and key in parsing_table and parsing_table[key] != value:
+                        conflicts.append(key)
+                    parsing_table[key] = value
         return parsing_table
 
-def verify_sentence(input_sentence, parsing_table, S):
+def verify_sentence(input_sentence, parsing_table, S, symbols=()):
     stack = ['$', S]
     input_sentence += '$'
-    parsing_table_symbols = [symbol for key in parsing_table.keys() for symbol in key]
+    # Símbolos da gramática entram mesmo sem coluna própria na tabela; '$' fecha a entrada
+    parsing_table_symbols = [symbol for key in parsing_table.keys() for symbol in key] + list(symbols) + ['$']
     symbol_tmp = ""
+    expanded = {}  # não-terminal -> altura da pilha abaixo dele ao ser expandido sem consumir entrada
     for character in input_sentence:
         symbol_tmp += character
         if symbol_tmp in parsing_table_symbols:
+            expanded.clear()
             while True:
                 #print(f"{stack} ---- {symbol_tmp}")
                 if stack[-1] == symbol_tmp:
@@ -240,7 +352,15 @@ def verify_sentence(input_sentence, parsing_table, S):
                 except:
                     return False
 
+                # Expandir de novo o mesmo não-terminal sem consumir entrada e sem que a pilha abaixo dele
+                # tenha mudado repete as mesmas expansões para sempre (recursão à esquerda na tabela)
+                below = len(stack) - 1
+                if expanded.get(stack[-1], below + 1) <= below:
+                    return False
+                expanded[stack[-1]] = below
                 stack.pop()
+                for symbol in [symbol for symbol, height in expanded.items() if height > len(stack)]:
+                    del expanded[symbol]
                 if production == '&':
                     break
                 else:
@@ -265,7 +385,7 @@ def main():
         print("A gramática não é LL1.")
         return  
     parsing_table = cfg.compute_parsing_table()
-    sentence_is_valid = verify_sentence(input_sentence, parsing_table, S)
+    sentence_is_valid = verify_sentence(input_sentence, parsing_table, S, N + T)
     output = IOHandler.format_output(N, S, T, parsing_table, sentence_is_valid)
     print(output)  # Imprime o resultado
 